@@ -7,8 +7,10 @@ from geochimp.utils.docusign import (
     search_envelope_by_custom_field,
 )
 from geochimp.utils.mediavalet import (
-    get_mediavalet_assets,
+    TAGGING_ASSET_FIELDS,
     get_mediavalet_folder_id,
+    get_tagging_message,
+    iter_mediavalet_assets,
     tag_mediavalet_attributes,
 )
 from map.models import Map
@@ -57,15 +59,14 @@ def tag_powerform_check(request, powerform_submission_id):
     # @TODO: DRY all of this!
     submission = tr.submission
     mediavalet_folder = get_mediavalet_folder_id(submission.camera_folder)
-    asset_list = get_mediavalet_assets(mediavalet_folder)
-    asset_ids = tuple(x["id"] for x in asset_list)
+    assets = iter_mediavalet_assets(mediavalet_folder, TAGGING_ASSET_FIELDS)
 
-    tag_mediavalet_attributes(attributes_to_tag, asset_ids)
+    results = tag_mediavalet_attributes(attributes_to_tag, assets)
     return render(
         request,
         template_name="photo_tagger/success.html",
         context={
-            "message": f"Successfully tagged assets for " f"{submission.camera_folder}",
+            "message": get_tagging_message(submission.camera_folder, results),
         },
     )
 
@@ -57,6 +57,16 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Tokens and the MediaValet attribute catalog are cached, and should be shared by all
+# processes (web and workers), so by default the database cache is used. Unlike the
+# file based cache, it can be used as a lock (see `geochimp.utils.tokens`).
+# The table is created with `python manage.py createcachetable`.
+
+CACHES = {"default": env.cache_url("CACHE_URL", default="dbcache://geochimp_cache")}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -174,6 +184,25 @@ DOCUSIGN_MAP_PUBLISH_POWERFORM_URL = env("DOCUSIGN_MAP_PUBLISH_POWERFORM_URL")
 ESRI_SURVEY_ID = env("ESRI_SURVEY_ID")
 ESRI_USERNAME = env("ESRI_USERNAME")
 ESRI_PASSWORD = env("ESRI_PASSWORD")
+# each worker logs in to ArcGIS once and re-uses the session, until it's older
+# than this (in seconds). ArcGIS tokens for built-in users expire after 2 hours.
+ESRI_SESSION_TTL = env.int("ESRI_SESSION_TTL", default=3600)
+# survey data is written to a columnar snapshot here, which is memory-mapped by all
+# workers. Must be shared by all containers/processes of a host.
+SURVEY_SNAPSHOT_DIR = env(
+    "SURVEY_SNAPSHOT_DIR", default=str(BASE_DIR / "data" / "survey")
+)
+# low-cardinality Survey123 fields, stored as categoricals to save memory
+SURVEY_CATEGORICAL_FIELDS = env.list(
+    "SURVEY_CATEGORICAL_FIELDS", default=["camera_id", "project_name"]
+)
+# Survey123 submissions are mirrored into the local database. When the mirror is
+# older than this (in seconds), new and edited submissions are pulled on next access.
+# Run `python manage.py sync_survey --full` for a complete re-sync.
+SURVEY_SYNC_INTERVAL = env.int("SURVEY_SYNC_INTERVAL", default=120)
+# map jobs running for longer than this (in seconds) are marked as failed, as their
+# worker probably died
+MAP_JOB_TIMEOUT = env.int("MAP_JOB_TIMEOUT", default=2 * 60 * 60)
 
 # which category/folder to use as parent for new categories (folders)
 MEDIAVAULT_BASE_CATEGORY = env("MEDIAVAULT_BASE_CATEGORY")
@@ -182,4 +211,51 @@ MEDIAVALET_CLIENT_ID = env("MEDIAVALET_CLIENT_ID")
 MEDIAVALET_CLIENT_SECRET = env("MEDIAVALET_CLIENT_SECRET")
 MEDIAVALET_USERNAME = env("MEDIAVALET_USERNAME")
 MEDIAVALET_PASSWORD = env("MEDIAVALET_PASSWORD")
+# MediaValet HTTP client: seconds to wait for a response, connections kept open per
+# host and how often idempotent requests are retried on 429 and 5xx responses
+MEDIAVALET_TIMEOUT = env.int("MEDIAVALET_TIMEOUT", default=30)
+MEDIAVALET_POOL_SIZE = env.int("MEDIAVALET_POOL_SIZE", default=10)
+MEDIAVALET_MAX_RETRIES = env.int("MEDIAVALET_MAX_RETRIES", default=3)
+# requests to MediaValet in flight at the same time, when working on many assets
+MEDIAVALET_MAX_IN_FLIGHT = env.int("MEDIAVALET_MAX_IN_FLIGHT", default=16)
+# requests per second to the MediaValet API (and burst), shared by all threads of a
+# process. Concurrency adapts to throttling, up to MEDIAVALET_MAX_IN_FLIGHT
+MEDIAVALET_RATE_LIMIT = env.float("MEDIAVALET_RATE_LIMIT", default=10.0)
+MEDIAVALET_RATE_BURST = env.int("MEDIAVALET_RATE_BURST", default=20)
+# how many photos are uploaded to MediaValet at the same time
+MEDIAVALET_UPLOAD_CONCURRENCY = env.int("MEDIAVALET_UPLOAD_CONCURRENCY", default=4)
+# files larger than MEDIAVALET_BLOCK_SIZE bytes (e.g. videos) are uploaded in blocks,
+# MEDIAVALET_BLOCK_CONCURRENCY blocks of a file at the same time
+MEDIAVALET_BLOCK_SIZE = env.int("MEDIAVALET_BLOCK_SIZE", default=4 * 1024 * 1024)
+MEDIAVALET_BLOCK_CONCURRENCY = env.int("MEDIAVALET_BLOCK_CONCURRENCY", default=4)
+# unfinished uploads are resumed within this many seconds, after that their upload
+# URL has probably expired, and they are discarded (see `reap_uploads` command)
+MEDIAVALET_UPLOAD_JOURNAL_TTL = env.int(
+    "MEDIAVALET_UPLOAD_JOURNAL_TTL", default=24 * 60 * 60
+)
+# how many assets are tagged at the same time
+MEDIAVALET_TAG_CONCURRENCY = env.int("MEDIAVALET_TAG_CONCURRENCY", default=8)
+# how many assets are downloaded at the same time
+MEDIAVALET_DOWNLOAD_CONCURRENCY = env.int("MEDIAVALET_DOWNLOAD_CONCURRENCY", default=4)
+# assets downloaded from MediaValet are cached here (shared by all processes of a
+# host), least recently used ones are evicted above MEDIAVALET_ASSET_CACHE_SIZE bytes
+MEDIAVALET_ASSET_CACHE_DIR = env(
+    "MEDIAVALET_ASSET_CACHE_DIR", default=str(BASE_DIR / "data" / "assets")
+)
+MEDIAVALET_ASSET_CACHE_SIZE = env.int(
+    "MEDIAVALET_ASSET_CACHE_SIZE", default=5 * 1024 * 1024 * 1024
+)
+# seconds the attribute name -> id catalog is cached. Unknown names always trigger
+# a refresh, so this only matters for renamed attributes
+MEDIAVALET_ATTRIBUTES_CACHE_TTL = env.int(
+    "MEDIAVALET_ATTRIBUTES_CACHE_TTL", default=24 * 60 * 60
+)
+# seconds the folder name -> id index is cached, unknown names trigger a refresh
+MEDIAVALET_FOLDERS_CACHE_TTL = env.int("MEDIAVALET_FOLDERS_CACHE_TTL", default=60 * 60)
+# unknown folder names refresh the index at most once per this many seconds
+MEDIAVALET_FOLDERS_REFRESH_INTERVAL = env.int(
+    "MEDIAVALET_FOLDERS_REFRESH_INTERVAL", default=60
+)
+# number of folders/assets requested per page from the MediaValet API
+MEDIAVALET_PAGE_SIZE = env.int("MEDIAVALET_PAGE_SIZE", default=100)
 # 3rd-party config end
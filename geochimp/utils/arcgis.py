@@ -1,37 +1,643 @@
+import bisect
+import copy
 import datetime
-import json
+import functools
+import logging
+import re
+import threading
+import time
 from urllib.parse import urljoin, urlparse
 
+import numpy as np
+import pandas as pd
 import pyproj
+import requests
 from django.conf import settings
-from map.map_template import map_template, single_feature_template
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from geochimp.utils.snapshot import (
+    get_current_generation,
+    load_snapshot,
+    write_snapshot,
+)
+from map.map_template import base_map, single_feature
+from photo_tagger.models import Submission, SurveySubmission, SurveySync
 
 import arcgis
 from arcgis.gis import GIS
 
+# Survey123 fields containing dates. When we read submissions from the local mirror,
+# those have to be converted back from their JSON representation
+SURVEY_DATE_FIELDS = ("CreationDate", "EditDate", "date_and_time_of_camera_setup_o")
 
-def get_submissions_df():
-    gis = GIS(username=settings.ESRI_USERNAME, password=settings.ESRI_PASSWORD)
-    survey_manager = arcgis.apps.survey123.SurveyManager(gis)
 
-    survey = survey_manager.get(settings.ESRI_SURVEY_ID)
-    survey_data_df = survey.download("DF")
+logger = logging.getLogger(__name__)
+
+# arcgis appends e.g. "(Error Code: 498)" to the message of exceptions it raises for
+# API errors. 498 is an invalid or expired token, 499 a missing token.
+TOKEN_EXPIRED_ERROR_RE = re.compile(r"\(Error Code: 49[89]\)")
+
+
+def is_arcgis_error(e):
+    """Whether e is an error returned by the ArcGIS API, or a network error.
+
+    arcgis raises plain exceptions for API errors, not a subclass.
+    """
+    return type(e) is Exception or isinstance(e, requests.RequestException)
+
+
+def is_token_expired_error(e):
+    return type(e) is Exception and bool(TOKEN_EXPIRED_ERROR_RE.search(str(e)))
+
+
+class GISSessionProvider:
+    """Log in to ArcGIS once per process and re-use the authenticated session.
+
+    Logging in takes a couple of seconds, which we don't want to pay on every
+    call. The session is replaced when it's older than ESRI_SESSION_TTL, or when
+    a call fails because the token expired.
+    """
+
+    def __init__(self):
+        self._gis = None
+        self._logged_in_at = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "login_seconds": 0.0}
+
+    def _login(self):
+        start = time.monotonic()
+        self._gis = GIS(
+            username=settings.ESRI_USERNAME, password=settings.ESRI_PASSWORD
+        )
+        self._logged_in_at = time.monotonic()
+        self._stats["login_seconds"] += self._logged_in_at - start
+
+    def get(self, force_login=False):
+        with self._lock:
+            expired = (
+                self._logged_in_at is None
+                or time.monotonic() - self._logged_in_at > settings.ESRI_SESSION_TTL
+            )
+            if self._gis is None or expired or force_login:
+                self._stats["misses"] += 1
+                self._login()
+            else:
+                self._stats["hits"] += 1
+            return self._gis
+
+    def invalidate(self):
+        with self._lock:
+            self._gis = None
+
+    def call(self, func, idempotent=True):
+        """Call `func` with the GIS session, log in again if the token expired.
+
+        Only idempotent calls are retried. If e.g. adding an item fails with an
+        expired token, we can't know if it was added, so the error is raised, and
+        the next call logs in again.
+        """
+        try:
+            return func(self.get())
+        except Exception as e:
+            # arcgis raises plain exceptions, only the error code in the message
+            # tells us that the token expired
+            if not is_token_expired_error(e):
+                raise
+            if not idempotent:
+                self.invalidate()
+                raise
+            return func(self.get(force_login=True))
+
+    def stats(self):
+        """Return session hits/misses and the average login latency in seconds."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_login_seconds"] = (
+            stats["login_seconds"] / stats["misses"] if stats["misses"] else 0.0
+        )
+        return stats
+
+
+gis_sessions = GISSessionProvider()
+
+
+def get_survey_layer(gis):
+    """Get the feature layer behind the survey, to be able to query it directly."""
+    survey_item = gis.content.get(settings.ESRI_SURVEY_ID)
+    feature_service = survey_item.related_items("Survey2Service", "forward")[0]
+    return feature_service.layers[0]
+
+
+def download_submissions_df(since=None):
+    """Download submissions from Survey123 as DataFrame.
+
+    Without `since`, the whole survey is downloaded. Otherwise, only submissions
+    created or edited at or after `since` are queried from the survey layer.
+    """
+    if since is None:
+
+        def download(gis):
+            survey_manager = arcgis.apps.survey123.SurveyManager(gis)
+            survey = survey_manager.get(settings.ESRI_SURVEY_ID)
+            return survey.download("DF")
+
+        survey_data_df = gis_sessions.call(download)
+        return survey_data_df
+
+    timestamp = since.astimezone(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    where = (
+        f"CreationDate >= timestamp '{timestamp}' "
+        f"OR EditDate >= timestamp '{timestamp}'"
+    )
+    survey_data_df = gis_sessions.call(
+        lambda gis: get_survey_layer(gis).query(where=where).sdf
+    )
     return survey_data_df
 
 
-def get_submissions_for_camera_folder(camera_folder):
+def to_aware_datetime(value):
+    """Survey123 dates are naive UTC timestamps, Django wants aware datetimes."""
+    if value is None:
+        return None
+    value = pd.Timestamp(value).to_pydatetime()
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def store_survey_submissions(survey_data_df):
+    """Insert or update submissions of a survey DataFrame in the local mirror.
+
+    Only submissions that are new, or whose CreationDate/EditDate changed, are
+    written. The generation of the mirror is only incremented if any were, so
+    workers don't rebuild their indexes for submissions they already have.
+    Returns the global IDs of all submissions in the DataFrame, the number of
+    changed submissions and their latest CreationDate/EditDate.
+    """
+    # NaN/NaT can't be stored in JSON (at least not in Postgres), use None instead
+    survey_data_df = survey_data_df.astype(object).where(survey_data_df.notna(), None)
+    submissions_raw = survey_data_df.to_dict("records")
+
+    submissions = {}
+    latest_date = None
+    for submission_raw in submissions_raw:
+        creation_date = to_aware_datetime(submission_raw.get("CreationDate"))
+        edit_date = to_aware_datetime(submission_raw.get("EditDate"))
+        camera_setup = submission_raw.get("date_and_time_of_camera_setup_o")
+        submissions[submission_raw["globalid"]] = SurveySubmission(
+            global_id=submission_raw["globalid"],
+            camera_id=submission_raw.get("camera_id") or "",
+            camera_setup_date=camera_setup.date() if camera_setup else None,
+            creation_date=creation_date,
+            edit_date=edit_date,
+            submission_raw=submission_raw,
+        )
+        for date in (creation_date, edit_date):
+            if date and (latest_date is None or date > latest_date):
+                latest_date = date
+
+    with transaction.atomic():
+        existing = {
+            global_id: (pk, creation_date, edit_date)
+            for global_id, pk, creation_date, edit_date in (
+                SurveySubmission.objects.filter(
+                    global_id__in=submissions.keys()
+                ).values_list("global_id", "pk", "creation_date", "edit_date")
+            )
+        }
+        to_create, to_update = [], []
+        for global_id, submission in submissions.items():
+            if global_id not in existing:
+                to_create.append(submission)
+                continue
+            # the watermark query returns submissions edited at the watermark again
+            pk, creation_date, edit_date = existing[global_id]
+            if (submission.creation_date, submission.edit_date) != (
+                creation_date,
+                edit_date,
+            ):
+                submission.pk = pk
+                to_update.append(submission)
+
+        SurveySubmission.objects.bulk_create(to_create, batch_size=500)
+        SurveySubmission.objects.bulk_update(
+            to_update,
+            fields=[
+                "camera_id",
+                "camera_setup_date",
+                "creation_date",
+                "edit_date",
+                "submission_raw",
+            ],
+            batch_size=500,
+        )
+        changed = len(to_create) + len(to_update)
+        if changed:
+            SurveySync.objects.get_or_create(pk=1)
+            SurveySync.objects.filter(pk=1).update(generation=F("generation") + 1)
+
+    return list(submissions.keys()), changed, latest_date
+
+
+def sync_survey_submissions(full=False):
+    """Pull new and edited Survey123 submissions into the local mirror.
+
+    Only submissions created or edited since the last sync (the watermark) are
+    downloaded. With `full=True`, the whole survey is downloaded and submissions
+    that no longer exist in Survey123 are removed from the mirror.
+    Returns the number of new, edited and removed submissions.
+    """
+    sync_state, _ = SurveySync.objects.get_or_create(pk=1)
+    since = None if full else sync_state.watermark
+
+    survey_data_df = download_submissions_df(since=since)
+
+    with transaction.atomic():
+        global_ids, changed, latest_date = store_survey_submissions(survey_data_df)
+        sync_state.refresh_from_db()
+        if full:
+            deleted, _ = SurveySubmission.objects.exclude(
+                global_id__in=global_ids
+            ).delete()
+            if deleted:
+                changed += deleted
+                sync_state.generation += 1
+
+        if latest_date and (
+            sync_state.watermark is None or latest_date > sync_state.watermark
+        ):
+            sync_state.watermark = latest_date
+        sync_state.synced_at = timezone.now()
+        sync_state.save()
+
+    if get_current_generation() != sync_state.generation:
+        write_survey_snapshot()
+
+    return changed
+
+
+def write_survey_snapshot():
+    """Write the local mirror to a snapshot, which is shared by all workers."""
+    generation = SurveySync.objects.values_list("generation", flat=True).first() or 0
+    write_snapshot(get_submissions_df(sync=False), generation)
+    return generation
+
+
+def get_survey_snapshot():
+    """Return (generation, pyarrow.Table) of the current survey snapshot."""
+    sync_survey_submissions_if_stale()
+    generation, table = load_snapshot()
+    # snapshots written before globalid was included have to be replaced
+    if table is None or "globalid" not in table.column_names:
+        write_survey_snapshot()
+        generation, table = load_snapshot()
+    return generation, table
+
+
+def sync_survey_submissions_if_stale():
+    """Run an incremental sync if the last one is older than SURVEY_SYNC_INTERVAL.
+
+    The worker that manages to update `synced_at` first runs the sync, the others
+    keep using the mirror as-is.
+    """
+    sync_state, _ = SurveySync.objects.get_or_create(pk=1)
+    max_age = datetime.timedelta(seconds=settings.SURVEY_SYNC_INTERVAL)
+    if sync_state.synced_at and timezone.now() - sync_state.synced_at < max_age:
+        return
+
+    claimed = SurveySync.objects.filter(pk=1, synced_at=sync_state.synced_at).update(
+        synced_at=timezone.now()
+    )
+    if claimed:
+        sync_survey_submissions()
+
+
+def get_submissions_df(sync=True):
+    """Return all submissions from the local mirror as DataFrame.
+
+    See `project_survey_df` for which fields are included.
+    """
+    if sync:
+        sync_survey_submissions_if_stale()
+
+    submissions_raw = SurveySubmission.objects.values_list("submission_raw", flat=True)
+    # only keep the fields we use right away, the mirror contains every survey field
+    survey_data_df = pd.DataFrame.from_records(
+        list(submissions_raw), columns=get_survey_fields()
+    )
+    for field in SURVEY_DATE_FIELDS:
+        if field in survey_data_df:
+            # Django stores these as ISO strings, with or without milliseconds
+            survey_data_df[field] = pd.to_datetime(
+                survey_data_df[field].map(
+                    datetime.datetime.fromisoformat, na_action="ignore"
+                )
+            )
+    return project_survey_df(survey_data_df)
+
+
+def parse_camera_folder(camera_folder):
+    """Split e.g. CAMERA1_20220801 into camera_id and camera setup date."""
     camera_id, date_str = camera_folder.split("_", 1)
-    camera_setup_date = datetime.datetime.strptime(  # noqa: F841
+    camera_setup_date = datetime.datetime.strptime(
         date_str, settings.CAMERA_SETUP_DATE_FORMAT
     ).date()
+    return camera_id, camera_setup_date
+
+
+def build_camera_folder_index(survey_data_df):
+    """Map (camera_id, camera setup date) to the latest submission by CreationDate.
+
+    If there are multiple submissions for the same camera folder, we use the
+    latest one. This is done in one pass over the whole DataFrame, instead of
+    querying it for every camera folder.
+    The values are dicts with `submission_raw` and `submission_cleaned`, so
+    Submission objects can be created from them directly.
+    """
+    camera_date_field = "date_and_time_of_camera_setup_o"
+    if survey_data_df.empty:
+        return {}
+
+    latest_df = (
+        survey_data_df.assign(
+            camera_setup_date=survey_data_df[camera_date_field].dt.date
+        )
+        .sort_values("CreationDate", kind="stable")
+        .drop_duplicates(["camera_id", "camera_setup_date"], keep="last")
+    )
+    keys = zip(latest_df["camera_id"], latest_df["camera_setup_date"])
+    latest_df = latest_df.drop(columns="camera_setup_date")
+    # NaN/NaT can't be stored in JSON (at least not in Postgres), use None instead
+    latest_df = latest_df.astype(object).where(latest_df.notna(), None)
+    values = (
+        {"submission_raw": submission_raw, "submission_cleaned": submission_cleaned}
+        for submission_raw, submission_cleaned in zip(
+            latest_df.to_dict("records"), clean_submissions_df(latest_df)
+        )
+    )
+    return dict(zip(keys, values))
+
+
+def build_camera_folder_index_from_snapshot(table):
+    """Map (camera_id, camera setup date) to the row of the latest submission.
+
+    Same as `build_camera_folder_index`, but for a snapshot table, and the values
+    are row positions in the table. Only the columns needed to find the latest
+    submissions are read, the submissions themselves are read row by row when
+    they're looked up, see `get_submissions_from_snapshot`.
+    """
+    camera_date_field = "date_and_time_of_camera_setup_o"
+    keys_df = table.select(["camera_id", camera_date_field, "CreationDate"]).to_pandas()
+    if keys_df.empty:
+        return {}
+
+    latest_df = (
+        keys_df.assign(camera_setup_date=keys_df[camera_date_field].dt.date)
+        .sort_values("CreationDate", kind="stable")
+        .drop_duplicates(["camera_id", "camera_setup_date"], keep="last")
+    )
+    keys = zip(latest_df["camera_id"], latest_df["camera_setup_date"])
+    return dict(zip(keys, latest_df.index.tolist()))
+
+
+def get_submissions_from_snapshot(table, rows):
+    """Return `submission_raw` and `submission_cleaned` for rows of the snapshot.
+
+    The snapshot only has the fields we use, so the raw survey records are read
+    from the local mirror, all with one query. Returns a list with a dict for each
+    row, or None if the submission was removed from the mirror.
+    """
+    if not rows:
+        return []
+    survey_data_df = table.take(rows).to_pandas()
+    # NaN/NaT can't be stored in JSON (at least not in Postgres), use None instead
+    survey_data_df = survey_data_df.astype(object).where(survey_data_df.notna(), None)
+    global_ids = survey_data_df["globalid"].tolist()
+    submissions_raw = dict(
+        SurveySubmission.objects.filter(global_id__in=global_ids).values_list(
+            "global_id", "submission_raw"
+        )
+    )
+    return [
+        {
+            "submission_raw": submissions_raw[global_id],
+            "submission_cleaned": submission_cleaned,
+        }
+        if global_id in submissions_raw
+        else None
+        for global_id, submission_cleaned in zip(
+            global_ids, clean_submissions_df(survey_data_df)
+        )
+    ]
+
+
+# index of the current survey snapshot, rebuilt whenever its generation changes.
+# `rows` maps camera folders to rows of `table`, `fetched` has submissions this
+# worker looked up in Survey123 since, see `fetch_submission_for_camera_folder`
+_camera_folder_index = {
+    "generation": None,
+    "table": None,
+    "rows": {},
+    "fetched": {},
+    "camera_folders": [],
+}
+
 
-    survey_data_df = get_submissions_df()
+def format_camera_folder(camera_id, camera_setup_date):
+    return (
+        f"{camera_id}_{camera_setup_date.strftime(settings.CAMERA_SETUP_DATE_FORMAT)}"
+    )
+
+
+def get_camera_folder_index():
+    generation, table = get_survey_snapshot()
+    if generation != _camera_folder_index["generation"]:
+        rows = build_camera_folder_index_from_snapshot(table)
+        _camera_folder_index.update(
+            table=table,
+            rows=rows,
+            fetched={},
+            camera_folders=sorted(
+                format_camera_folder(camera_id, camera_setup_date)
+                for camera_id, camera_setup_date in rows.keys()
+            ),
+            generation=generation,
+        )
+    return _camera_folder_index
+
+
+def get_camera_folders():
+    """Return the names of all camera folders with submissions."""
+    return get_camera_folder_index()["camera_folders"]
+
+
+def get_survey_fields():
+    """Survey fields referenced in METADATA_ATTRIBUTES, plus the ones we need to
+    identify a submission and its camera folder.
+    """
+    fields = {
+        "globalid",
+        "CreationDate",
+        "camera_id",
+        "date_and_time_of_camera_setup_o",
+    }
+    for submission_field, _, _ in parse_metadata_attributes():
+        fields.add(submission_field)
+        if submission_field.endswith("_other"):
+            fields.add(submission_field.removesuffix("_other"))
+    return sorted(fields)
+
+
+def get_survey_out_fields():
+    """Fields to request from the survey layer.
+
+    Same as `get_survey_fields`, plus the ones we need to sync submissions.
+    Geometry (e.g. SHAPE) isn't a field, it is returned separately.
+    """
+    geometry_fields = {x for x, _, keys in parse_metadata_attributes() if keys}
+    out_fields = set(get_survey_fields()) - geometry_fields
+    return sorted(out_fields | {"EditDate"})
+
+
+def project_survey_df(survey_data_df):
+    """Reduce a survey DataFrame to the fields we use, with compact dtypes.
+
+    Low-cardinality fields (SURVEY_CATEGORICAL_FIELDS) become categoricals, and
+    fields like SHAPE are flattened into float columns, e.g. `SHAPE_x` and
+    `SHAPE_y`, instead of a dict per row.
+    """
+    fields = [x for x in get_survey_fields() if x in survey_data_df]
+    lean_df = survey_data_df[fields].copy()
 
-    matching_submissions = survey_data_df.query(
-        "camera_id == @camera_id and date_and_time_of_camera_setup_o.dt.date "
-        "== @camera_setup_date"
+    for submission_field, _, keys in parse_metadata_attributes():
+        if not keys or submission_field not in lean_df:
+            continue
+        for key in keys:
+            lean_df[f"{submission_field}_{key}"] = pd.to_numeric(
+                lean_df[submission_field].str.get(key), errors="coerce"
+            ).astype("float64")
+        lean_df = lean_df.drop(columns=submission_field)
+
+    for field in settings.SURVEY_CATEGORICAL_FIELDS:
+        if field in lean_df:
+            lean_df[field] = lean_df[field].astype("category")
+
+    return lean_df
+
+
+def query_submissions_for_camera_folder(camera_folder):
+    """Query the survey layer for the submissions of a single camera folder.
+
+    The filter is applied by ArcGIS, so only matching submissions and the fields
+    we need are transferred. If ArcGIS rejects the query, or it fails because of a
+    network error, we fall back to downloading the whole survey and filtering it
+    here.
+    """
+    camera_id, camera_setup_date = parse_camera_folder(camera_folder)
+    camera_date_field = "date_and_time_of_camera_setup_o"
+    escaped_camera_id = camera_id.replace("'", "''")
+    next_date = camera_setup_date + datetime.timedelta(days=1)
+    where = (
+        f"camera_id = '{escaped_camera_id}' "
+        f"AND {camera_date_field} >= DATE '{camera_setup_date.isoformat()}' "
+        f"AND {camera_date_field} < DATE '{next_date.isoformat()}'"
+    )
+    out_fields = ",".join(get_survey_out_fields())
+
+    try:
+        return gis_sessions.call(
+            lambda gis: get_survey_layer(gis)
+            .query(where=where, out_fields=out_fields, return_geometry=True)
+            .sdf
+        )
+    except Exception as e:
+        if not is_arcgis_error(e):
+            raise
+        logger.warning(
+            "Querying the survey layer for %s failed, downloading the whole "
+            "survey instead: %s",
+            camera_folder,
+            e,
+        )
+        survey_data_df = download_submissions_df()
+        return survey_data_df[
+            (survey_data_df["camera_id"] == camera_id)
+            & (survey_data_df[camera_date_field].dt.date == camera_setup_date)
+        ]
+
+
+def fetch_submission_for_camera_folder(camera_folder):
+    """Look up a camera folder that isn't in the survey snapshot (yet) in Survey123.
+
+    The latest matching submission is added to the index of this worker. It isn't
+    added to the mirror, as the query only returns the fields we use, and the
+    mirror only replaces rows that were edited in Survey123. The next sync adds the
+    complete submission instead. Returns the latest submission, or None if there is
+    no submission for camera_folder.
+    """
+    survey_data_df = query_submissions_for_camera_folder(camera_folder)
+    if survey_data_df.empty:
+        return None
+
+    camera_folder_index = build_camera_folder_index(survey_data_df)
+    key = parse_camera_folder(camera_folder)
+    submission = camera_folder_index.get(key)
+    if submission is not None:
+        _camera_folder_index["fetched"][key] = submission
+        if camera_folder not in _camera_folder_index["camera_folders"]:
+            bisect.insort(_camera_folder_index["camera_folders"], camera_folder)
+    return submission
+
+
+def get_submission_for_camera_folder(camera_folder):
+    """Return the latest submission for camera_folder, or None."""
+    return get_submissions_for_camera_folders([camera_folder])[camera_folder]
+
+
+def get_submissions_for_camera_folders(camera_folders):
+    """Return a dict with the latest submission (or None) for each camera folder.
+
+    Camera folders that aren't in the survey snapshot are looked up in Survey123.
+    """
+    camera_folder_index = get_camera_folder_index()
+    submissions = {}
+    snapshot_rows = {}
+    for camera_folder in camera_folders:
+        key = parse_camera_folder(camera_folder)
+        submissions[camera_folder] = camera_folder_index["fetched"].get(key)
+        if submissions[camera_folder] is None and key in camera_folder_index["rows"]:
+            snapshot_rows[camera_folder] = camera_folder_index["rows"][key]
+
+    # all camera folders in the snapshot are read at once
+    submissions.update(
+        zip(
+            snapshot_rows.keys(),
+            get_submissions_from_snapshot(
+                camera_folder_index["table"], list(snapshot_rows.values())
+            ),
+        )
+    )
+
+    for camera_folder, submission in submissions.items():
+        if submission is None:
+            submissions[camera_folder] = fetch_submission_for_camera_folder(
+                camera_folder
+            )
+    return submissions
+
+
+@functools.lru_cache(maxsize=None)
+def parse_metadata_attributes():
+    """Parse METADATA_ATTRIBUTES into (submission_field, label, keys) tuples.
+
+    `keys` are the values to extract from fields like `SHAPE=x~y`, e.g.
+    ("x", "y"), and None for all other fields.
+    """
+    return tuple(
+        (submission_field, label, tuple(label.split("~")) if "~" in label else None)
+        for submission_field, label in settings.METADATA_ATTRIBUTES.items()
     )
-    return matching_submissions
 
 
 def clean_submission(submission_raw):
@@ -52,15 +658,19 @@ def clean_submission(submission_raw):
     E.g. `SHAPE=x~y` will extract `x` and `y` from `SHAPE`, and store those with
     the uppercase key as label.
     """
-    metadata_fields = settings.METADATA_ATTRIBUTES
-
     submission_cleaned = {}
-    for submission_field, label in metadata_fields.items():
-        if "~" in label:
+    for submission_field, label, keys in parse_metadata_attributes():
+        if keys:
             # we are dealing with a special value like SHAPE, have to extract values
-            x, y = label.split("~")
-            submission_cleaned[x] = (x.upper(), submission_raw[submission_field][x])
-            submission_cleaned[y] = (y.upper(), submission_raw[submission_field][y])
+            for key in keys:
+                # fields may already be flattened, see `project_survey_df`
+                flat_field = f"{submission_field}_{key}"
+                value = (
+                    submission_raw[flat_field]
+                    if flat_field in submission_raw
+                    else submission_raw[submission_field][key]
+                )
+                submission_cleaned[key] = (key.upper(), value)
             continue
 
         if submission_field.endswith("_other"):
@@ -82,36 +692,108 @@ def clean_submission(submission_raw):
     return submission_cleaned
 
 
+def clean_submissions_df(survey_data_df):
+    """Column-wise version of `clean_submission` for a whole DataFrame.
+
+    Returns a list with the cleaned submission for each row, identical to calling
+    `clean_submission` for each record, but without a Python loop over the fields
+    of every submission.
+    """
+    columns = {}
+    for submission_field, label, keys in parse_metadata_attributes():
+        if keys:
+            for key in keys:
+                # fields may already be flattened, see `project_survey_df`
+                flat_field = f"{submission_field}_{key}"
+                values = (
+                    survey_data_df[flat_field]
+                    if flat_field in survey_data_df
+                    else survey_data_df[submission_field].str.get(key)
+                )
+                columns[key] = (key.upper(), values)
+            continue
+
+        values = survey_data_df[submission_field]
+        if submission_field.endswith("_other"):
+            # same truthiness check as in `clean_submission`
+            values = values.where(
+                values.map(bool),
+                survey_data_df[submission_field.removesuffix("_other")],
+            )
+        columns[submission_field] = (label, values)
+
+    names = list(columns.keys())
+    labels = [label for label, _ in columns.values()]
+    rows = zip(*(values.tolist() for _, values in columns.values()))
+    return [
+        {name: (label, value) for name, label, value in zip(names, labels, row)}
+        for row in rows
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_web_mercator_transformer():
+    """Creating a transformer is expensive, so we only do it once per process."""
+    return pyproj.Transformer.from_crs(4326, 3857, always_xy=True)
+
+
 def convert_coordinates_for_arcgis_map(x, y):
     """Convert from GPS coordinates to arcgis map projections.
 
     e.g. (7.1396999999998805,50.69659999999914) => (794787.768416722, 6567800.23790998)
+    x and y can also be arrays, which are converted in a single call.
     """
-    proj = pyproj.Transformer.from_crs(4326, 3857, always_xy=True)
+    return get_web_mercator_transformer().transform(x, y)
 
-    return proj.transform(x, y)
 
+def project_submissions(submissions):
+    """Set Web Mercator coordinates on Submission objects, without saving them.
 
-def interpolate_map_template(submission_attributes):
-    """Returns map JSON with features for each submission."""
-    feature_list = []
-    for value_dict in submission_attributes.values():
-        feature_str = single_feature_template % value_dict
-        feature_list.append(json.loads(feature_str))
+    All submissions are converted in a single call, so building a map never has to
+    convert coordinates.
+    """
+    # submission_cleaned["x"] == ["X", -60.05227999999994]
+    x = np.array([x.submission_cleaned["x"][1] for x in submissions], dtype=float)
+    y = np.array([x.submission_cleaned["y"][1] for x in submissions], dtype=float)
+    x_web_mercator, y_web_mercator = convert_coordinates_for_arcgis_map(x, y)
+
+    for submission, x, y in zip(submissions, x_web_mercator, y_web_mercator):
+        submission.x_web_mercator = float(x) if np.isfinite(x) else None
+        submission.y_web_mercator = float(y) if np.isfinite(y) else None
+
+
+def create_submissions(survey_submissions):
+    """Create Submission objects from a dict of camera_folder: survey submission.
+
+    Survey submissions are the values of the camera folder index, see
+    `get_submissions_for_camera_folders`. Returns a dict of camera_folder: Submission.
+    """
+    submissions = {
+        camera_folder: Submission(camera_folder=camera_folder, **survey_submission)
+        for camera_folder, survey_submission in survey_submissions.items()
+    }
+    project_submissions(list(submissions.values()))
+    for submission in submissions.values():
+        submission.save()
+    return submissions
+
+
+def get_map_feature_set(map_dict):
+    return map_dict["operationalLayers"][0]["featureCollection"]["layers"][0][
+        "featureSet"
+    ]
 
-    map_dict = json.loads(map_template)
-    map_dict["operationalLayers"][0]["featureCollection"]["layers"][0]["featureSet"][
-        "features"
-    ] = feature_list
 
+def interpolate_map_template(submission_attributes):
+    """Returns map dict with features for each submission."""
+    map_dict = copy.deepcopy(base_map)
+    get_map_feature_set(map_dict)["features"].extend(
+        single_feature(**values) for values in submission_attributes.values()
+    )
     return map_dict
-    # @TODO: remove this
-    return json.dumps(map_dict)
 
 
 def create_arcgis_webmap(map_json, title, tags, snippet):
-    gis = GIS(username=settings.ESRI_USERNAME, password=settings.ESRI_PASSWORD)
-
     webmap_dict = {
         "type": "Web Map",
         "title": title,
@@ -120,18 +802,19 @@ def create_arcgis_webmap(map_json, title, tags, snippet):
         "text": map_json,
     }
 
-    new_webmap = gis.content.add(item_properties=webmap_dict)
+    # adding an item isn't idempotent, retrying could create the webmap twice
+    new_webmap = gis_sessions.call(
+        lambda gis: gis.content.add(item_properties=webmap_dict), idempotent=False
+    )
     return new_webmap
 
 
 def publish_arcgis_webmap(map):
     """Publish a map object."""
-    gis = GIS(username=settings.ESRI_USERNAME, password=settings.ESRI_PASSWORD)
     webmap_url = map.webmap_url
     webmap_id = urlparse(webmap_url).query.split("=")[-1]
 
-    webmap = gis.content.get(webmap_id)
-    webmap.share(everyone=True)
+    gis_sessions.call(lambda gis: gis.content.get(webmap_id).share(everyone=True))
 
     # I couldn't get webmap.url, even after publishing. Maybe it takes time.
     # Anyway, we should be able to just compose it
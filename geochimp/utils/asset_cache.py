@@ -0,0 +1,85 @@
+"""Size-bounded disk cache of assets downloaded from MediaValet.
+
+Files are keyed by asset ID and version, so an asset is only downloaded again if
+it changed in MediaValet. The cache is shared by all workers of a host. When it
+grows over MEDIAVALET_ASSET_CACHE_SIZE, the least recently used files are evicted.
+A cache hit updates the file's mtime, which is what LRU order is based on.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+def get_mediavalet_asset_version(asset):
+    """Return a version of the asset's file, which changes when the file changes.
+
+    The `file` dict of MediaValet assets has name, size, dates etc. of the file.
+    """
+    file_json = json.dumps(asset["file"], sort_keys=True)
+    return hashlib.sha256(file_json.encode()).hexdigest()[:16]
+
+
+def get_asset_cache_path(asset_id, version):
+    key = hashlib.sha256(f"{asset_id}:{version}".encode()).hexdigest()
+    return Path(settings.MEDIAVALET_ASSET_CACHE_DIR) / key[:2] / key
+
+
+def get_cached_asset(asset_id, version):
+    """Return path of the cached asset, or None if it's not cached."""
+    path = get_asset_cache_path(asset_id, version)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+@contextlib.contextmanager
+def open_cached_asset_for_writing(asset_id, version):
+    """Write to a temporary file, which is moved into the cache if no error occurs.
+
+    That way other workers never see partially downloaded files.
+    """
+    path = get_asset_cache_path(asset_id, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with open(fd, "wb") as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def evict_cached_assets(max_size=None):
+    """Delete least recently used files until the cache fits into max_size bytes.
+
+    Returns the number of deleted files.
+    """
+    if max_size is None:
+        max_size = settings.MEDIAVALET_ASSET_CACHE_SIZE
+    cache_files = []
+    for path in Path(settings.MEDIAVALET_ASSET_CACHE_DIR).glob("*/*"):
+        if path.name.startswith(".tmp-"):
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        cache_files.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(size for _, size, _ in cache_files)
+    evicted = 0
+    for _, size, path in sorted(cache_files, key=lambda x: x[0]):
+        if total_size <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total_size -= size
+        evicted += 1
+    return evicted
@@ -2,6 +2,10 @@
 
 Such code is commonly placed into __init__.py but I prefer a separate module.
 """
+import asyncio
+import hashlib
+
+from django.db import close_old_connections
 from exif import Image
 
 
@@ -52,3 +56,56 @@ def write_gps_coordinates_to_exif(lat_lon, file_path):
         image.gps_latitude_ref = gps_dms["gps_latitude_ref"]
 
         output_image_file.write(image.get_file())
+
+
+async def gather_bounded(func, iterable, concurrency):
+    """Await func(item) for each item, at most concurrency at the same time.
+
+    Unlike asyncio.gather, the items are taken from iterable only when a worker is
+    free, so long streams (e.g. of MediaValet assets) don't pile up in memory.
+    iterable may be a blocking generator, it is advanced in a thread.
+    Returns the results in order.
+    """
+    iterator = enumerate(iterable)
+    lock = asyncio.Lock()
+    results = {}
+
+    async def worker():
+        while True:
+            # generators can't be advanced from several threads at once
+            async with lock:
+                item = await asyncio.to_thread(next, iterator, None)
+            if item is None:
+                return
+            i, x = item
+            results[i] = await func(x)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return [results[i] for i in range(len(results))]
+
+
+async def run_db_query(func, *args, **kwargs):
+    """Run a synchronous database query from async code, in a thread.
+
+    Outside of requests, Django doesn't close broken or expired connections,
+    e.g. after the database was restarted. So like Django does before and after
+    each request, this is done before and after the query.
+    """
+
+    def run():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return await asyncio.to_thread(run)
+
+
+def get_file_sha256(file_path):
+    """Hash file in chunks, so large files aren't read into memory."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
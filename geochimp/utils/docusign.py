@@ -3,7 +3,8 @@ from urllib.parse import parse_qs, urlparse
 
 import docusign_esign as ds
 from django.conf import settings
-from django.core.cache import cache
+
+from geochimp.utils.tokens import TokenManager
 
 
 def retrieve_docusign_token():
@@ -18,15 +19,18 @@ def retrieve_docusign_token():
     return token.access_token
 
 
-def get_docusign_token():
-    """Retrieve DocuSign token from cache or set it.
+# DocuSign auth token expires after 3600, regardless of what is passed as
+# `expires_in`. We don't want to get a new token for each request, so we cache
+# it and use it for 3540s, to avoid trying to use a stale token. It's refreshed in
+# the background during the last 5 minutes.
+docusign_tokens = TokenManager(
+    "docusign", lambda: retrieve_docusign_token(), ttl=3540, refresh_before=300
+)
 
-    DocuSign auth token expires after 3600, regardless of what is passed as
-    `expires_in`. We don't want to get a new token for each request, so we cache
-    it and expire it after 3540s, to avoid trying to use a stale token.
-    """
-    token = cache.get_or_set("docusign-token", retrieve_docusign_token, 3540)
-    return token
+
+def get_docusign_token():
+    """Retrieve DocuSign token from cache or set it."""
+    return docusign_tokens.get()
 
 
 def get_powerform_id_from_url(powerform_url):
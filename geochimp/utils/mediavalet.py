@@ -1,15 +1,354 @@
+import asyncio
+import base64
+import datetime
+import hashlib
+import os
+import re
+import threading
+import time
+import types
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+from xml.etree import ElementTree
 
+import httpx
 import requests
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+from geochimp.utils.asset_cache import (
+    evict_cached_assets,
+    get_asset_cache_path,
+    get_cached_asset,
+    get_mediavalet_asset_version,
+    open_cached_asset_for_writing,
+)
+from geochimp.utils.common import gather_bounded, get_file_sha256, run_db_query
+from geochimp.utils.ratelimit import AdaptiveRateLimiter, parse_retry_after
+from geochimp.utils.tokens import TokenManager
+from photo_tagger.models import (
+    UPLOAD_ADDED_TO_FOLDER,
+    UPLOAD_BLOB_UPLOADED,
+    UPLOAD_TITLE_SET,
+    UploadedAsset,
+    UploadJournal,
+)
+
+MEDIAVALET_API_URL = "https://api.mediavalet.com"
+# replacing values with JSON-Patch is idempotent, so we can retry PATCH
+MEDIAVALET_RETRY_METHODS = {"GET", "PUT", "PATCH", "DELETE"}
+MEDIAVALET_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EndpointStats:
+    """Number of requests and total seconds for each endpoint."""
+
+    def __init__(self):
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, url, seconds):
+        # group by endpoint, e.g. "PATCH api.mediavalet.com/assets/{id}"
+        endpoint = re.sub(r"^https://|\?.*$", "", str(url))
+        endpoint = re.sub(r"/[0-9a-fA-F-]{32,36}(?=/|$)", "/{id}", endpoint)
+        if ".blob.core.windows.net" in endpoint:
+            endpoint = endpoint.split("/", 1)[0] + "/{blob}"
+        with self._lock:
+            latency = self._latencies.setdefault(
+                f"{method} {endpoint}", {"count": 0, "seconds": 0.0}
+            )
+            latency["count"] += 1
+            latency["seconds"] += seconds
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: dict(x) for endpoint, x in self._latencies.items()}
+
+
+mediavalet_stats = EndpointStats()
+
+# MediaValet's API management throttles with 429 responses. All requests to the API
+# of this process share this limiter, requests to the blob storage aren't limited.
+mediavalet_limiter = AdaptiveRateLimiter(
+    rate=settings.MEDIAVALET_RATE_LIMIT,
+    burst=settings.MEDIAVALET_RATE_BURST,
+    max_concurrency=settings.MEDIAVALET_MAX_IN_FLIGHT,
+)
+
+
+def release_mediavalet_limiter(res):
+    if res is None:
+        mediavalet_limiter.release()
+    else:
+        retry_after = parse_retry_after(res.headers.get("Retry-After"))
+        mediavalet_limiter.release(res.status_code, retry_after)
+
+
+def get_retry_delay(res, attempt):
+    """Wait as long as the API asks us to, or back off exponentially."""
+    if res is not None:
+        retry_after = parse_retry_after(res.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after
+    return 0.5 * 2**attempt
+
+
+def get_mediavalet_url(url):
+    return f"{MEDIAVALET_API_URL}{url}" if url.startswith("/") else url
+
+
+def get_mediavalet_auth_headers(headers=None):
+    return {
+        "Authorization": f"Bearer {get_mediavalet_token()}",
+        "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
+        **(headers or {}),
+    }
+
+
+def is_mediavalet_token_rejected(res, attempt, authenticated):
+    """A 401 response means our token isn't valid anymore.
+
+    The clients replace it and retry the request once, regardless of the method.
+    """
+    return authenticated and res is not None and res.status_code == 401 and attempt == 0
+
+
+def get_mediavalet_retry(method, res, attempt, authenticated):
+    """Decide if a request to MediaValet is retried, used by both clients.
+
+    res is None if the request failed with a connection error. Returns the seconds
+    to wait before the next attempt, or None if the response (or error) is final.
+    Requests with a rejected token are retried right away, see
+    `is_mediavalet_token_rejected`. Idempotent requests are retried on connection
+    errors, 429 and 5xx responses.
+    """
+    if is_mediavalet_token_rejected(res, attempt, authenticated):
+        return 0
+    if method not in MEDIAVALET_RETRY_METHODS:
+        return None
+    if attempt >= settings.MEDIAVALET_MAX_RETRIES:
+        return None
+    if res is None or res.status_code in MEDIAVALET_RETRY_STATUSES:
+        return get_retry_delay(res, attempt)
+    return None
+
+
+class MediaValetClient:
+    """Client for the MediaValet API, using a pooled keep-alive session.
+
+    Re-using connections saves a TCP+TLS handshake per request, which adds up
+    since most operations take several requests. Requests to the API are sent with
+    the auth headers, and go through the shared rate limiter. Other URLs, like
+    Shared Access Signature (SAS) URLs for uploads and downloads, are requested
+    with `authenticated=False`.
+    Idempotent requests are retried with backoff on connection errors, 429 and 5xx
+    responses, see `get_mediavalet_retry`.
+    """
+
+    def __init__(self):
+        # urllib3 only retries connection errors. Responses are retried in request(),
+        # so every attempt goes through the rate limiter. urllib3 would retry 429 and
+        # 503 responses with a Retry-After header by default, that's turned off.
+        retry = Retry(
+            total=settings.MEDIAVALET_MAX_RETRIES,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=MEDIAVALET_RETRY_METHODS,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=settings.MEDIAVALET_POOL_SIZE,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, authenticated=True, **kwargs):
+        url = get_mediavalet_url(url)
+        headers = kwargs.pop("headers", None)
+        kwargs.setdefault("timeout", settings.MEDIAVALET_TIMEOUT)
+
+        attempt = 0
+        while True:
+            if authenticated:
+                kwargs["headers"] = get_mediavalet_auth_headers(headers)
+            else:
+                kwargs["headers"] = headers
+            res = self.send(method, url, **kwargs)
+            delay = get_mediavalet_retry(method, res, attempt, authenticated)
+            if delay is None:
+                return res
+            if is_mediavalet_token_rejected(res, attempt, authenticated):
+                mediavalet_tokens.invalidate()
+            time.sleep(delay)
+            attempt += 1
+
+    def send(self, method, url, **kwargs):
+        limited = url.startswith(MEDIAVALET_API_URL)
+        if limited:
+            mediavalet_limiter.acquire()
+        res = None
+        start = time.monotonic()
+        try:
+            res = self.session.request(method, url, **kwargs)
+            return res
+        finally:
+            mediavalet_stats.record(method, url, time.monotonic() - start)
+            if limited:
+                release_mediavalet_limiter(res)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def stats(self):
+        """Return number of requests and total seconds for each endpoint."""
+        return mediavalet_stats.stats()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_mediavalet_client():
+    """Return the MediaValetClient of this process, so connections are re-used."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MediaValetClient()
+    return _client
+
+
+class AsyncMediaValetClient:
+    """asyncio client for the MediaValet API, for operations on many assets.
+
+    It shares the auth token, the rate limiter and the endpoint stats with
+    MediaValetClient. At most MEDIAVALET_MAX_IN_FLIGHT requests are sent at the same
+    time. Requests are retried like those of MediaValetClient, see
+    `get_mediavalet_retry`.
+    The client is bound to the event loop it's used in, use it with `async with`.
+    """
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(settings.MEDIAVALET_MAX_IN_FLIGHT)
+        self.client = httpx.AsyncClient(
+            timeout=settings.MEDIAVALET_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.MEDIAVALET_MAX_IN_FLIGHT),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def request(self, method, url, authenticated=True, **kwargs):
+        url = get_mediavalet_url(url)
+        headers = kwargs.pop("headers", None)
+
+        attempt = 0
+        while True:
+            if authenticated:
+                # the token manager may block on the cache or a login
+                kwargs["headers"] = await asyncio.to_thread(
+                    get_mediavalet_auth_headers, headers
+                )
+            else:
+                kwargs["headers"] = headers
+            try:
+                res = await self.send(method, url, **kwargs)
+            except httpx.TransportError:
+                delay = get_mediavalet_retry(method, None, attempt, authenticated)
+                if delay is None:
+                    raise
+            else:
+                delay = get_mediavalet_retry(method, res, attempt, authenticated)
+                if delay is None:
+                    return res
+                if is_mediavalet_token_rejected(res, attempt, authenticated):
+                    # deleting the token from the cache may block
+                    await asyncio.to_thread(mediavalet_tokens.invalidate)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def send(self, method, url, **kwargs):
+        limited = url.startswith(MEDIAVALET_API_URL)
+        async with self.semaphore:
+            if limited:
+                await mediavalet_limiter.acquire_async()
+            res = None
+            start = time.monotonic()
+            try:
+                res = await self.client.request(method, url, **kwargs)
+                return res
+            finally:
+                mediavalet_stats.record(method, url, time.monotonic() - start)
+                if limited:
+                    release_mediavalet_limiter(res)
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Stream the response body of an unauthenticated request, e.g. a SAS URL."""
+        start = time.monotonic()
+        try:
+            async with self.semaphore:
+                async with self.client.stream(method, url, **kwargs) as res:
+                    yield res
+        finally:
+            mediavalet_stats.record(method, url, time.monotonic() - start)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+
+def run_with_async_client(func, *args):
+    """Run `func(client, *args)` with an AsyncMediaValetClient on a new event loop.
+
+    This is how the synchronous functions below fan out to many requests.
+    """
+
+    async def main():
+        async with AsyncMediaValetClient() as client:
+            return await func(client, *args)
+
+    return asyncio.run(main())
 
 
 def retrieve_mediavalet_token():
-    res = requests.post(
-        url="https://login.mediavalet.com/connect/token",
+    res = get_mediavalet_client().post(
+        "https://login.mediavalet.com/connect/token",
+        authenticated=False,
         data={
             "grant_type": "password",
             "username": settings.MEDIAVALET_USERNAME,
@@ -20,23 +359,31 @@ def retrieve_mediavalet_token():
             settings.MEDIAVALET_CLIENT_ID, settings.MEDIAVALET_CLIENT_SECRET
         ),
     )
+    res.raise_for_status()
     return res.json()["access_token"]
 
 
-def get_mediavalet_token():
-    """Retrieve mediavalet-token from cache or set it.
+# MediaValet auth token expires after 300s. We don't want to get a new token for
+# each request, so we cache it and use it for 240s, to avoid trying to use a stale
+# token. It's refreshed in the background after 180s.
+mediavalet_tokens = TokenManager(
+    "mediavalet", lambda: retrieve_mediavalet_token(), ttl=240, refresh_before=60
+)
 
-    MediaValet auth token expires after 300s. We don't want to get a new token for
-    each request, so we cache it and expire it after 240s, to avoid trying to use
-    a stale token.
-    """
-    token = cache.get_or_set("mediavalet-token", retrieve_mediavalet_token, 240)
-    return token
+
+def get_mediavalet_token():
+    """Retrieve mediavalet-token from cache or set it."""
+    return mediavalet_tokens.get()
 
 
 def create_mediavalet_folder(camera_folder):
     # @TODO: Ask user instead of just re-using existing folder
     existing_folder_id = get_mediavalet_folder_id(camera_folder)
+    if existing_folder_id:
+        return existing_folder_id
+    # the folder might have been created since the index was refreshed, and
+    # MediaValet happily creates a second folder with the same name
+    existing_folder_id = get_mediavalet_folder_index(refresh=True).get(camera_folder)
     if existing_folder_id:
         return existing_folder_id
 
@@ -47,15 +394,13 @@ def create_mediavalet_folder(camera_folder):
         "treeName": camera_folder,
         "categoryId": new_folder_id,
     }
-    res = requests.post(
-        "https://api.mediavalet.com/categories",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    res = get_mediavalet_client().post(
+        "/categories",
         data=data,
     )
-    return new_folder_id if res.status_code == 201 else None
+    res.raise_for_status()
+    add_to_mediavalet_folder_index(camera_folder, new_folder_id)
+    return new_folder_id
 
 
 def delete_mediavalet_folder_by_id(folder_id):
@@ -63,172 +408,613 @@ def delete_mediavalet_folder_by_id(folder_id):
 
     It looks like I can't delete categories/folders via the web interface?!
     """
-    requests.delete(
-        f"https://api.mediavalet.com/categories/{folder_id}",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    res = get_mediavalet_client().delete(
+        f"/categories/{folder_id}",
     )
+    res.raise_for_status()
 
 
-def get_mediavalet_folder_id(camera_folder):
-    """Get MediaValet folder corresponsing to camera_folder from MediaValet API.
+def retrieve_mediavalet_folder_index():
+    """Retrieve all subfolders of MEDIAVAULT_BASE_CATEGORY, as dict of names and IDs.
 
     MediaValet calls folders "Categories", and uses a UUID to identify them.
     There is a `treeName` attribute of folders that corresponds to their
     display name.
-    It doesn't seem possible to search/retrieve by folder name, so we get a
-    list of all subfolders of MEDIAVAULT_BASE_CATEGORY and iterate through
-    the results to identify the correct category ID.
+    Subfolders are returned in pages of MEDIAVALET_PAGE_SIZE, we walk all of them.
     """
-    res = requests.get(
-        f"https://api.mediavalet.com/folders/{settings.MEDIAVAULT_BASE_CATEGORY}/"
-        f"subfolders",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    client = get_mediavalet_client()
+    page_size = settings.MEDIAVALET_PAGE_SIZE
+    folder_index = {}
+    offset = 0
+    while True:
+        res = client.get(
+            f"/folders/{settings.MEDIAVAULT_BASE_CATEGORY}/subfolders",
+            params={"offset": offset, "count": page_size},
+        )
+        res.raise_for_status()
+        subfolder_list = res.json()["payload"]
+        new_folders = {x["name"]: x["id"] for x in subfolder_list}
+        # stop on the last page, or if the API ignores the paging parameters
+        if not new_folders.keys() - folder_index.keys():
+            break
+        folder_index.update(new_folders)
+        if len(subfolder_list) < page_size:
+            break
+        offset += page_size
+    return folder_index
+
+
+def get_mediavalet_folder_index(refresh=False):
+    """Retrieve the folder index from cache or set it."""
+    if refresh:
+        folder_index = retrieve_mediavalet_folder_index()
+        cache.set(
+            "mediavalet-folders", folder_index, settings.MEDIAVALET_FOLDERS_CACHE_TTL
+        )
+        return folder_index
+    return cache.get_or_set(
+        "mediavalet-folders",
+        retrieve_mediavalet_folder_index,
+        settings.MEDIAVALET_FOLDERS_CACHE_TTL,
     )
-    subfolder_list = res.json()["payload"]
-    try:
-        category = next(x for x in subfolder_list if x["name"] == camera_folder)
-    except StopIteration:
-        return None
 
-    return category["id"]
 
+def add_to_mediavalet_folder_index(camera_folder, folder_id):
+    """Add a folder we created to the index, until the index is refreshed.
+
+    Every folder is stored with its own key, because updating the cached index
+    would overwrite folders added by other processes at the same time. It expires
+    after the cached index, so the next index retrieved from MediaValet has it.
+    """
+    cache.set(
+        f"mediavalet-folder-{camera_folder}",
+        folder_id,
+        settings.MEDIAVALET_FOLDERS_CACHE_TTL,
+    )
 
-def get_mediavalet_assets(folder_id):
+
+def get_mediavalet_folder_id(camera_folder):
+    """Get MediaValet folder corresponsing to camera_folder.
+
+    It doesn't seem possible to search/retrieve by folder name, so we keep an index
+    of all subfolders of MEDIAVAULT_BASE_CATEGORY in the cache. If camera_folder
+    isn't in there, it might have been created in the MediaValet web interface,
+    so we refresh the index. Refreshing walks all pages of folders, so it's done
+    at most once per MEDIAVALET_FOLDERS_REFRESH_INTERVAL, by all processes.
+    Until then, unknown folders are treated as missing, except for folders we
+    created ourselves (see `add_to_mediavalet_folder_index`).
+    """
+    folder_index = get_mediavalet_folder_index()
+    if camera_folder in folder_index:
+        return folder_index[camera_folder]
+    folder_id = cache.get(f"mediavalet-folder-{camera_folder}")
+    if folder_id is None and cache.add(
+        "mediavalet-folders-refreshed",
+        True,
+        settings.MEDIAVALET_FOLDERS_REFRESH_INTERVAL,
+    ):
+        folder_id = get_mediavalet_folder_index(refresh=True).get(camera_folder)
+    return folder_id
+
+
+def get_mediavalet_assets_page(folder_id, offset, count):
+    res = get_mediavalet_client().get(
+        f"/categories/{folder_id}/assets",
+        params={"offset": offset, "count": count},
+    )
+    res.raise_for_status()
+    return res.json()["payload"]["assets"]
+
+
+def iter_mediavalet_assets(folder_id, fields=None, page_size=None):
+    """Iterate over all assets belonging to a category/folder, page by page.
+
+    The next page is requested while the caller handles the current one.
+    fields is an optional list of asset keys to keep, e.g. ("id", "title"),
+    to not hold on to the full asset dicts.
+    """
+    page_size = page_size or settings.MEDIAVALET_PAGE_SIZE
+    with ThreadPoolExecutor(1) as executor:
+        offset = 0
+        next_page = executor.submit(get_mediavalet_assets_page, folder_id, 0, page_size)
+        first_asset_id = None
+        while next_page is not None:
+            asset_list = next_page.result()
+            # stop if the API ignores the paging parameters and returns the same page
+            if not asset_list or asset_list[0]["id"] == first_asset_id:
+                return
+            first_asset_id = asset_list[0]["id"]
+
+            next_page = None
+            if len(asset_list) == page_size:
+                offset += page_size
+                next_page = executor.submit(
+                    get_mediavalet_assets_page, folder_id, offset, page_size
+                )
+
+            for asset in asset_list:
+                yield asset if fields is None else {k: asset.get(k) for k in fields}
+
+
+def get_mediavalet_assets(folder_id, fields=None):
     """Retrieve a list of all assets belonging to a category/folder."""
-    res = requests.get(
-        f"https://api.mediavalet.com/categories/{folder_id}/assets",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    return list(iter_mediavalet_assets(folder_id, fields=fields))
+
+
+def retrieve_mediavalet_attribute_catalog():
+    """Retrieve all attributes from MediaValet, as a dict of names and IDs."""
+    res = get_mediavalet_client().get(
+        "/attributes",
     )
-    asset_list = res.json()["payload"]["assets"]
-    return asset_list
+    res.raise_for_status()
+    return {x["name"]: x["id"] for x in res.json()["payload"]}
 
 
-def get_attribute_ids_for_names(*args):
-    """We have to look up the attribute IDs to be able to update attributes.
+def get_mediavalet_attribute_catalog(refresh=False):
+    """Retrieve the attribute catalog from cache or set it.
 
-    Accepting multiple attribute names to avoid several calls.
+    Attributes are almost never changed, so the catalog is cached for
+    MEDIAVALET_ATTRIBUTES_CACHE_TTL, and shared by all processes.
     """
-    res = requests.get(
-        "https://api.mediavalet.com/attributes",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    if refresh:
+        catalog = retrieve_mediavalet_attribute_catalog()
+        cache.set(
+            "mediavalet-attributes", catalog, settings.MEDIAVALET_ATTRIBUTES_CACHE_TTL
+        )
+        return catalog
+    return cache.get_or_set(
+        "mediavalet-attributes",
+        retrieve_mediavalet_attribute_catalog,
+        settings.MEDIAVALET_ATTRIBUTES_CACHE_TTL,
     )
-    attribute_list = res.json()["payload"]
 
-    attribute_ids = []
-    for name in args:
-        attribute_ids.append(next(x["id"] for x in attribute_list if x["name"] == name))
-    return attribute_ids
+
+def invalidate_mediavalet_attribute_catalog():
+    """Call this after attributes are added or renamed in MediaValet."""
+    cache.delete("mediavalet-attributes")
 
 
-def set_mediavalet_attribute(asset_id, attribute_id, value):
-    """Set MediaValet attribute by attribute ID.
+def get_attribute_ids_for_names(*args):
+    """We have to look up the attribute IDs to be able to update attributes.
+
+    Accepting multiple attribute names to avoid several lookups. If a name is not
+    in the cached catalog, it might have been added since, so we refresh it once.
+    """
+    catalog = get_mediavalet_attribute_catalog()
+    if any(name not in catalog for name in args):
+        catalog = get_mediavalet_attribute_catalog(refresh=True)
+    return [catalog[name] for name in args]
+
+
+def get_attribute_path(attribute_id):
+    """Return the JSON-Patch path to set an attribute by attribute ID.
 
     Unfortunately, it seems there is a special case for "Description" (and
     other attributes?), which can't be set by /attributes/attribute_uuid
     like the other attributes have to be set, but rather by /description.
     """
-    path = (
+    return (
         f"/{settings.METADATA_DESCRIPTION_ATTRIBUTE.lower()}"
         if attribute_id == settings.METADATA_DESCRIPTION_ATTRIBUTE
         else f"/attributes/{attribute_id}"
     )
-    requests.patch(
-        f"https://api.mediavalet.com/assets/{asset_id}",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+
+
+async def async_patch_mediavalet_asset(client, asset_id, attribute_values):
+    """Set several attributes of an asset with a single JSON-Patch request.
+
+    attribute_values is a dict with attribute IDs and values.
+    """
+    res = await client.patch(
+        f"/assets/{asset_id}",
         json=[
             {
                 "op": "replace",
-                "path": path,
+                "path": get_attribute_path(attribute_id),
                 "value": value,
             }
+            for attribute_id, value in attribute_values.items()
         ],
     )
+    res.raise_for_status()
 
 
-def upload_file_to_mediavalet_folder(file_path, folder_id):
-    """Uploading a file is a mult-step process."""
+def read_block(file_path, offset, size):
+    with open(file_path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+async def async_put_block(client, file_path, upload_url, block_id, offset, size):
+    """Upload one block of the file, if it fails only this block is retried.
+
+    The block is read from disk here, so only blocks in flight are in memory.
+    """
+    data = await asyncio.to_thread(read_block, file_path, offset, size)
+    res = await client.put(
+        f"{upload_url}&comp=block&blockid={quote(block_id, safe='')}",
+        authenticated=False,
+        content=data,
+    )
+    res.raise_for_status()
+
+
+async def async_get_uncommitted_blocks(client, upload_url):
+    """Return IDs and sizes of blocks already uploaded, but not committed yet."""
+    res = await client.get(
+        f"{upload_url}&comp=blocklist&blocklisttype=uncommitted",
+        authenticated=False,
+    )
+    if res.status_code == 404:
+        # nothing has been uploaded yet
+        return {}
+    res.raise_for_status()
+    root = ElementTree.fromstring(res.content)
+    return {
+        block.findtext("Name"): int(block.findtext("Size"))
+        for block in root.iter("Block")
+    }
+
+
+async def async_upload_file_to_sas_url(client, file_path, upload_url, resume=False):
+    """Upload file to the Azure blob storage SAS URL MediaValet gives us.
+
+    Small files are uploaded with a single request. Larger files, e.g. videos,
+    are uploaded in blocks of MEDIAVALET_BLOCK_SIZE bytes with Put Block,
+    several at the same time, and committed with Put Block List.
+    See https://learn.microsoft.com/en-us/rest/api/storageservices/put-block
+    With `resume`, blocks that were uploaded by an earlier attempt are skipped.
+    The SAS URL already has a query string with the signature, so the parameters
+    of these operations are appended to it, not passed as `params`.
+    """
+    block_size = settings.MEDIAVALET_BLOCK_SIZE
+    file_size = os.path.getsize(file_path)
+
+    if file_size <= block_size:
+        res = await client.put(
+            upload_url,
+            authenticated=False,
+            headers={"x-ms-blob-type": "BlockBlob", "Content-Type": "text/plain"},
+            content=await asyncio.to_thread(read_block, file_path, 0, file_size),
+        )
+        res.raise_for_status()
+        return
+
+    # block IDs have to be base64 encoded and all of the same length. They only
+    # depend on the position in the file, so an interrupted upload can be resumed
+    blocks = [
+        (base64.b64encode(f"{i:08d}".encode()).decode(), offset)
+        for i, offset in enumerate(range(0, file_size, block_size))
+    ]
+    uploaded_blocks = {}
+    if resume:
+        uploaded_blocks = await async_get_uncommitted_blocks(client, upload_url)
+    missing_blocks = [
+        (block_id, offset)
+        for block_id, offset in blocks
+        if uploaded_blocks.get(block_id) != min(block_size, file_size - offset)
+    ]
+    await gather_bounded(
+        lambda block: async_put_block(
+            client, file_path, upload_url, block[0], block[1], block_size
+        ),
+        missing_blocks,
+        settings.MEDIAVALET_BLOCK_CONCURRENCY,
+    )
+
+    block_list = "".join(f"<Latest>{block_id}</Latest>" for block_id, _ in blocks)
+    res = await client.put(
+        f"{upload_url}&comp=blocklist",
+        authenticated=False,
+        headers={"Content-Type": "application/xml"},
+        content=(
+            '<?xml version="1.0" encoding="utf-8"?>'
+            f"<BlockList>{block_list}</BlockList>"
+        ),
+    )
+    res.raise_for_status()
+
+
+async def async_discard_upload(client, journal):
+    """Delete an unfinished upload at MediaValet, and its journal."""
+    res = await client.delete(f"/uploads/{journal.asset_id}")
+    if res.status_code != 404:
+        res.raise_for_status()
+    await run_db_query(journal.delete)
+
+
+async def async_get_upload_journal(client, folder_id, sha256):
+    """Return the journal of an unfinished upload of the file, if it can be resumed.
+
+    The SAS URL of uploads older than MEDIAVALET_UPLOAD_JOURNAL_TTL has probably
+    expired, so they are discarded.
+    """
+    journal = await run_db_query(
+        UploadJournal.objects.filter(folder_id=folder_id, sha256=sha256).first
+    )
+    if journal is None:
+        return None
+    max_age = datetime.timedelta(seconds=settings.MEDIAVALET_UPLOAD_JOURNAL_TTL)
+    if journal.created_at < timezone.now() - max_age:
+        await async_discard_upload(client, journal)
+        return None
+    return journal
+
+
+async def async_upload_file_to_mediavalet_folder(
+    client, file_path, folder_id, sha256=None
+):
+    """Uploading a file is a mult-step process.
+
+    Completed steps are recorded in an UploadJournal for the file (identified by
+    its SHA-256) and folder. If an earlier attempt failed or was interrupted, the
+    upload is resumed from the first unfinished step.
+    Returns the ID of the new asset, raises `httpx.HTTPError` if a step fails.
+    """
     filename = file_path.split("/")[-1]
     # filename without extension - filename could contain dots before extension
     file_title = ".".join(filename.split(".")[:-1])
+    if sha256 is None:
+        sha256 = await asyncio.to_thread(get_file_sha256, file_path)
 
-    res = requests.post(
-        "https://api.mediavalet.com/uploads",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
-        json={"filename": filename},
-    )
-    upload_url = res.json()["payload"]["uploadUrl"]
-    new_asset_id = res.json()["payload"]["id"]
+    async def complete_step(step):
+        journal.step = step
+        await run_db_query(journal.save)
+
+    journal = await async_get_upload_journal(client, folder_id, sha256)
+    resume = journal is not None
+    if journal is None:
+        res = await client.post(
+            "/uploads",
+            json={"filename": filename},
+        )
+        res.raise_for_status()
+        journal = await run_db_query(
+            UploadJournal.objects.create,
+            sha256=sha256,
+            folder_id=folder_id,
+            asset_id=res.json()["payload"]["id"],
+            upload_url=res.json()["payload"]["uploadUrl"],
+        )
+    new_asset_id = journal.asset_id
 
     # upload file to temporary Shared Access Signature (SAS) URL
-    res = requests.put(
-        upload_url,
-        headers={"x-ms-blob-type": "BlockBlob", "Content-Type": "text/plain"},
-        data=open(file_path, "rb").read(),
-    )
+    if journal.step < UPLOAD_BLOB_UPLOADED:
+        await async_upload_file_to_sas_url(
+            client, file_path, journal.upload_url, resume=resume
+        )
+        await complete_step(UPLOAD_BLOB_UPLOADED)
 
     # add filename / title
     # @TODO: This step may be optional. Check if we need it
-    res = requests.put(
-        f"https://api.mediavalet.com/uploads/{new_asset_id}",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
-        json={"filename": filename, "title": file_title},
-    )
+    if journal.step < UPLOAD_TITLE_SET:
+        res = await client.put(
+            f"/uploads/{new_asset_id}",
+            json={"filename": filename, "title": file_title},
+        )
+        res.raise_for_status()
+        await complete_step(UPLOAD_TITLE_SET)
 
     # add uploaded asset to category
-    res = requests.post(
-        f"https://api.mediavalet.com/uploads/{new_asset_id}/categories",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
-        json=[folder_id],
-    )
+    if journal.step < UPLOAD_ADDED_TO_FOLDER:
+        res = await client.post(
+            f"/uploads/{new_asset_id}/categories",
+            json=[folder_id],
+        )
+        res.raise_for_status()
+        await complete_step(UPLOAD_ADDED_TO_FOLDER)
 
     # "approve" uploaded asset
-    res = requests.patch(
-        f"https://api.mediavalet.com/uploads/{new_asset_id}",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+    res = await client.patch(
+        f"/uploads/{new_asset_id}",
         json=[{"op": "replace", "path": "/status", "value": 1}],
     )
+    res.raise_for_status()
+    await run_db_query(journal.delete)
+
+    return new_asset_id
+
+
+def upload_file_to_mediavalet_folder(file_path, folder_id):
+    return run_with_async_client(
+        async_upload_file_to_mediavalet_folder, file_path, folder_id
+    )
+
+
+def reap_abandoned_uploads():
+    """Discard uploads not finished within MEDIAVALET_UPLOAD_JOURNAL_TTL of creation.
+
+    Returns the number of discarded uploads.
+    """
+    max_age = datetime.timedelta(seconds=settings.MEDIAVALET_UPLOAD_JOURNAL_TTL)
+    journals = list(
+        UploadJournal.objects.filter(created_at__lt=timezone.now() - max_age)
+    )
+
+    async def discard_uploads(client):
+        async def discard_upload(journal):
+            try:
+                await async_discard_upload(client, journal)
+            except httpx.HTTPError:
+                return False
+            return True
+
+        return await gather_bounded(
+            discard_upload, journals, settings.MEDIAVALET_UPLOAD_CONCURRENCY
+        )
+
+    return sum(run_with_async_client(discard_uploads))
+
+
+async def async_upload_photos_to_mediavalet_folder(
+    client, photos, folder_id, photo_hashes
+):
+    async def upload_photo(photo):
+        try:
+            asset_id = await async_upload_file_to_mediavalet_folder(
+                client, photo.photo.path, folder_id, photo_hashes[photo.id]
+            )
+        except Exception as e:
+            return {"photo": photo, "asset_id": None, "error": str(e)}
+        return {"photo": photo, "asset_id": asset_id, "error": None}
+
+    return await gather_bounded(
+        upload_photo, photos, settings.MEDIAVALET_UPLOAD_CONCURRENCY
+    )
 
 
 def upload_submission_photos_to_mediavalet(submission):
-    """Create folder for submission and upload photos"""
-    new_folder_id = create_mediavalet_folder(submission.camera_folder)
-    photos = submission.photos.all()
+    """Create folder for submission and upload photos.
+
+    Photos with the same content (SHA-256) as an asset already uploaded to the
+    folder, e.g. when the same SD card is uploaded again, are skipped.
+    Uploading a photo takes five requests, so several photos are uploaded at the
+    same time, at most MEDIAVALET_UPLOAD_CONCURRENCY.
+    Returns a list with a result dict for each photo, with the `asset_id` of
+    the uploaded (or `skipped`) photo or an `error` message.
+    """
+    photos = list(submission.photos.all())
+    try:
+        new_folder_id = create_mediavalet_folder(submission.camera_folder)
+    except requests.HTTPError as e:
+        error = f"Could not create MediaValet folder {submission.camera_folder}: {e}"
+        return [
+            {"photo": photo, "asset_id": None, "error": error, "skipped": False}
+            for photo in photos
+        ]
+
+    photo_hashes = {photo.id: get_file_sha256(photo.photo.path) for photo in photos}
+    asset_ids = dict(
+        UploadedAsset.objects.filter(
+            folder_id=new_folder_id, sha256__in=photo_hashes.values()
+        ).values_list("sha256", "asset_id")
+    )
+    # only upload the first of several photos with the same content
+    to_upload = {}
     for photo in photos:
-        upload_file_to_mediavalet_folder(photo.photo.path, new_folder_id)
+        if photo_hashes[photo.id] not in asset_ids:
+            to_upload.setdefault(photo_hashes[photo.id], photo)
+
+    upload_results = run_with_async_client(
+        async_upload_photos_to_mediavalet_folder,
+        list(to_upload.values()),
+        new_folder_id,
+        photo_hashes,
+    )
+    for result in upload_results:
+        result["skipped"] = False
+        if result["error"] is None:
+            sha256 = photo_hashes[result["photo"].id]
+            UploadedAsset.objects.get_or_create(
+                folder_id=new_folder_id,
+                sha256=sha256,
+                defaults={"asset_id": result["asset_id"]},
+            )
+            asset_ids[sha256] = result["asset_id"]
+
+    uploaded = {result["photo"].id: result for result in upload_results}
+    results = []
+    for photo in photos:
+        if photo.id in uploaded:
+            results.append(uploaded[photo.id])
+            continue
+        asset_id = asset_ids.get(photo_hashes[photo.id])
+        error = None if asset_id else "Same file as a photo that failed to upload"
+        results.append(
+            {"photo": photo, "asset_id": asset_id, "error": error, "skipped": True}
+        )
+    return results
+
+
+def backfill_uploaded_assets(camera_folder):
+    """Add hashes of assets uploaded to camera_folder to the UploadedAsset index.
+
+    Assets uploaded before the index existed, or in the MediaValet web interface,
+    are hashed from the asset cache, or downloaded and hashed without storing them.
+    Returns the number of assets added to the index.
+    """
+    folder_id = get_mediavalet_folder_id(camera_folder)
+    if folder_id is None:
+        return 0
+
+    known_asset_ids = set(
+        UploadedAsset.objects.filter(folder_id=folder_id).values_list(
+            "asset_id", flat=True
+        )
+    )
+    assets = (
+        x
+        for x in iter_mediavalet_assets(folder_id, fields=("id", "file"))
+        if x["id"] not in known_asset_ids
+    )
+
+    async def hash_assets(client):
+        get_download_link = get_download_link_once(client)
+
+        async def hash_asset(asset):
+            asset_id = asset["id"]
+            path = get_cached_asset(asset_id, get_mediavalet_asset_version(asset))
+            if path is not None:
+                sha256 = await asyncio.to_thread(get_file_sha256, path)
+                return UploadedAsset(
+                    sha256=sha256, asset_id=asset_id, folder_id=folder_id
+                )
+
+            sha256 = hashlib.sha256()
+            # the download writes chunks to a file, we just hash them
+            hashing_file = types.SimpleNamespace(write=sha256.update)
+            try:
+                await async_download_asset_to_file(
+                    client, asset_id, hashing_file, await get_download_link()
+                )
+            except Exception:
+                return None
+            return UploadedAsset(
+                sha256=sha256.hexdigest(), asset_id=asset_id, folder_id=folder_id
+            )
+
+        return await gather_bounded(
+            hash_asset, assets, settings.MEDIAVALET_DOWNLOAD_CONCURRENCY
+        )
+
+    uploaded_assets = [x for x in run_with_async_client(hash_assets) if x is not None]
+    UploadedAsset.objects.bulk_create(uploaded_assets, ignore_conflicts=True)
+    return len(uploaded_assets)
 
 
-def tag_mediavalet_attributes(attributes_to_tag, asset_ids):
+# asset fields needed by tag_mediavalet_attributes to only send changed values
+TAGGING_ASSET_FIELDS = ("id", "title", "attributes", "description")
+
+
+def get_attribute_changes(asset, attribute_values):
+    """Return the attribute values that differ from the asset's current values.
+
+    asset is an asset dict from the MediaValet API, with `attributes` (values by
+    attribute ID) and `description`. Values are compared as strings, as that's how
+    MediaValet stores them. If current values are missing, everything is changed.
+    """
+    current_values = asset.get("attributes") or {}
+    changes = {}
+    for attribute_id, value in attribute_values.items():
+        if attribute_id == settings.METADATA_DESCRIPTION_ATTRIBUTE:
+            current_value = asset.get("description")
+        else:
+            current_value = current_values.get(attribute_id)
+        if current_value is None or str(current_value) != str(value):
+            changes[attribute_id] = value
+    return changes
+
+
+def tag_mediavalet_attributes(attributes_to_tag, assets, dry_run=False):
     """Tag MediaValet assets with attributes.
 
     attributes_to_tag is a dict with Attribute names and values.
-    asset_ids is a list with IDs of assets we want to tag.
+    assets is an iterable with the assets we want to tag, e.g. streamed from
+    iter_mediavalet_assets with TAGGING_ASSET_FIELDS. Only attributes whose values
+    changed are sent, assets without changes are skipped.
+    Returns a list with a result dict for each asset, with the number of `changes`
+    and an `error` message if tagging the asset failed. With `dry_run`, nothing is
+    sent to MediaValet, and the changes that would be made are returned.
     """
     # we have to get attribute_ids for attribute names, can't use names directly.
     # Unfortunately, there seems to be a special case with "Description".
@@ -243,58 +1029,204 @@ def tag_mediavalet_attributes(attributes_to_tag, asset_ids):
     del attribute_ids[descr_idx]
     attribute_ids.insert(descr_idx, settings.METADATA_DESCRIPTION_ATTRIBUTE)
 
-    attribute_label_id = {
-        label: attribute_id
+    attribute_values = {
+        attribute_id: attributes_to_tag[label]
         for (label, attribute_id) in zip(attribute_names, attribute_ids)
     }
 
-    for asset_id in asset_ids:
-        for label, value in attributes_to_tag.items():
-            set_mediavalet_attribute(asset_id, attribute_label_id[label], value)
+    if dry_run:
+        return [
+            {
+                "asset_id": asset["id"],
+                "changes": len(get_attribute_changes(asset, attribute_values)),
+                "error": None,
+            }
+            for asset in assets
+        ]
 
+    # MediaValet doesn't seem to have a batch endpoint for updating several
+    # assets, so we send one patch with the changed attributes per asset,
+    # several at once
+    async def tag_assets(client):
+        async def tag_asset(asset):
+            changes = get_attribute_changes(asset, attribute_values)
+            result = {"asset_id": asset["id"], "changes": len(changes), "error": None}
+            if not changes:
+                return result
+            try:
+                await async_patch_mediavalet_asset(client, asset["id"], changes)
+            except Exception as e:
+                result["error"] = str(e)
+            return result
 
-def download_asset_from_mediavalet_by_id(asset_id):
-    res = requests.post(
-        "https://api.mediavalet.com/downloads/validate",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+        return await gather_bounded(
+            tag_asset, assets, settings.MEDIAVALET_TAG_CONCURRENCY
+        )
+
+    return run_with_async_client(tag_assets)
+
+
+def get_tagging_message(camera_folder, results):
+    """Summarize results of tag_mediavalet_attributes for the user."""
+    failed = [x for x in results if x["error"] is not None]
+    unchanged = sum(1 for x in results if x["changes"] == 0)
+    if not failed:
+        return (
+            f"Successfully tagged {len(results) - unchanged} assets for "
+            f"{camera_folder}, {unchanged} were already up to date"
+        )
+    failed_assets = ", ".join(x["asset_id"] for x in failed)
+    return (
+        f"Tagged {len(results) - len(failed) - unchanged} of {len(results)} assets "
+        f"for {camera_folder}, {unchanged} were already up to date. "
+        f"Failed: {failed_assets}"
+    )
+
+
+async def async_get_mediavalet_download_link(client):
+    """Validate a direct download and return the link to request SAS URLs from.
+
+    The link isn't specific to an asset, so it can be used for a batch of downloads.
+    """
+    res = await client.post(
+        "/downloads/validate",
         json={"isDirectDownload": "true"},
     )
-    download_link = res.json()["payload"]["downloadLink"]
+    res.raise_for_status()
+    return res.json()["payload"]["downloadLink"]
 
-    res = requests.post(
-        f"https://api.mediavalet.com/{download_link}",
-        headers={
-            "Authorization": f"Bearer {get_mediavalet_token()}",
-            "Ocp-Apim-Subscription-Key": settings.MEDIAVALET_SUBSCRIPTION_KEY,
-        },
+
+def get_download_link_once(client):
+    """Return a coroutine function that returns a download link.
+
+    The link is only requested on the first call, so no request is made if all
+    assets are read from the asset cache.
+    """
+    lock = asyncio.Lock()
+    download_link = None
+
+    async def get_download_link():
+        nonlocal download_link
+        async with lock:
+            if download_link is None:
+                download_link = await async_get_mediavalet_download_link(client)
+        return download_link
+
+    return get_download_link
+
+
+async def async_download_asset_to_file(client, asset_id, file, download_link):
+    """Download asset and write it to file in chunks, without holding it in memory."""
+    res = await client.post(
+        f"/{download_link}",
         json={
             "attributeIdValues": {},
             "assetId": asset_id,
         },
     )
+    res.raise_for_status()
     download_url = res.json()["payload"]["sasUrl"]
 
-    res = requests.get(
+    async with client.stream(
+        "GET",
         download_url,
         # @TODO: are these headers actually necessary?
         headers={"x-ms-blob-type": "BlockBlob", "Content-Type": "text/plain"},
-    )
-    return res.content
+    ) as res:
+        res.raise_for_status()
+        async for chunk in res.aiter_bytes(chunk_size=1024 * 1024):
+            file.write(chunk)
     # the MediaValet webinterface also does an empty request to
     # /assets/{asset_id}/downloaded
     # Don't think we have to do that here as it's not a user download
 
 
+async def async_download_asset_to_cache(client, asset, get_download_link):
+    """Return the path of the asset in the asset cache, download it if necessary.
+
+    asset is an asset dict with `id` and `file`, get_download_link is a coroutine
+    function, see `get_download_link_once`.
+    """
+    version = get_mediavalet_asset_version(asset)
+    path = get_cached_asset(asset["id"], version)
+    if path is None:
+        with open_cached_asset_for_writing(asset["id"], version) as file:
+            await async_download_asset_to_file(
+                client, asset["id"], file, await get_download_link()
+            )
+        path = get_asset_cache_path(asset["id"], version)
+    return path
+
+
+async def async_get_mediavalet_asset(client, asset_id):
+    res = await client.get(f"/assets/{asset_id}")
+    res.raise_for_status()
+    return res.json()["payload"]
+
+
+def download_asset_from_mediavalet_by_id(asset_id):
+    """Return the content of an asset, read through the asset cache."""
+
+    async def download(client):
+        asset = await async_get_mediavalet_asset(client, asset_id)
+        return await async_download_asset_to_cache(
+            client, asset, get_download_link_once(client)
+        )
+
+    content = run_with_async_client(download).read_bytes()
+    evict_cached_assets()
+    return content
+
+
 def download_mediavalet_folder_into_submission(submission):
+    """Download all assets of the submission's MediaValet folder as photos.
+
+    Assets are read from the asset cache, or streamed into it,
+    MEDIAVALET_DOWNLOAD_CONCURRENCY at the same time, and then saved as photos here,
+    so the database is only used from this thread. Assets that already are photos
+    of the submission are skipped.
+    Returns a list with a result dict for each downloaded asset, with the new
+    `photo` or an `error` message.
+    """
     mediavalet_folder_id = get_mediavalet_folder_id(submission.camera_folder)
-    asset_list = get_mediavalet_assets(mediavalet_folder_id)
+    if mediavalet_folder_id is None:
+        return []
+
+    existing_asset_ids = set(
+        submission.photos.exclude(mediavalet_asset_id="").values_list(
+            "mediavalet_asset_id", flat=True
+        )
+    )
+    assets = (
+        x
+        for x in iter_mediavalet_assets(mediavalet_folder_id, fields=("id", "file"))
+        if x["id"] not in existing_asset_ids
+    )
+
+    async def download_assets(client):
+        get_download_link = get_download_link_once(client)
+
+        async def download(asset):
+            try:
+                path = await async_download_asset_to_cache(
+                    client, asset, get_download_link
+                )
+            except Exception as e:
+                return asset, None, str(e)
+            return asset, path, None
 
-    assets = ((x["file"]["fileName"], x["id"]) for x in asset_list)
+        return await gather_bounded(
+            download, assets, settings.MEDIAVALET_DOWNLOAD_CONCURRENCY
+        )
 
-    for asset_title, asset_id in assets:
-        file_content = download_asset_from_mediavalet_by_id(asset_id)
-        photo = submission.photos.create()
-        photo.photo.save(asset_title, ContentFile(file_content))
+    results = []
+    for asset, path, error in run_with_async_client(download_assets):
+        if error is not None:
+            results.append({"asset_id": asset["id"], "photo": None, "error": error})
+            continue
+        with open(path, "rb") as file:
+            photo = submission.photos.create(mediavalet_asset_id=asset["id"])
+            photo.photo.save(asset["file"]["fileName"], File(file))
+        results.append({"asset_id": asset["id"], "photo": photo, "error": None})
+    evict_cached_assets()
+    return results
@@ -0,0 +1,117 @@
+"""Client side rate limiting for 3rd-party APIs, shared by all threads of a process."""
+import asyncio
+import collections
+import datetime
+import email.utils
+import threading
+import time
+
+
+def parse_retry_after(value):
+    """Return seconds to wait from a Retry-After header, or None.
+
+    The header is either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Token bucket with adaptive (AIMD) concurrency.
+
+    Requests take a token from a bucket that refills with `rate` tokens per second,
+    up to `burst`. On top of that, the number of requests in flight is limited.
+    The limit is halved when the API throttles us (429/503), and increased by
+    about one per round of successful requests, up to `max_concurrency`.
+    A Retry-After header pauses all requests until then.
+
+    Use `acquire()`/`acquire_async()` before and `release()` after each request.
+    """
+
+    throttle_statuses = {429, 503}
+
+    def __init__(self, rate, burst, max_concurrency):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._request_times = collections.deque()
+        self._throttle_events = 0
+        self._last_throttled = None
+        self._lock = threading.Lock()
+
+    def _try_acquire(self):
+        """Take a slot if possible, otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled_at) * self.rate
+            )
+            self._refilled_at = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.concurrency_limit):
+                return 0.05
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self.in_flight += 1
+            self._request_times.append(now)
+            return 0
+
+    def acquire(self):
+        while wait := self._try_acquire():
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while wait := self._try_acquire():
+            await asyncio.sleep(wait)
+
+    def release(self, status_code=None, retry_after=None):
+        """Release the slot, and adapt to the response status code.
+
+        status_code is None if the request failed without a response.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if status_code in self.throttle_statuses:
+                self._throttle_events += 1
+                self._last_throttled = time.time()
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+                if retry_after is not None:
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + retry_after
+                    )
+            elif status_code is not None and status_code < 500:
+                self.concurrency_limit = min(
+                    self.max_concurrency,
+                    self.concurrency_limit + 1 / self.concurrency_limit,
+                )
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._request_times and self._request_times[0] < now - 60:
+                self._request_times.popleft()
+            return {
+                "requests_per_second": len(self._request_times) / 60,
+                "concurrency_limit": int(self.concurrency_limit),
+                "in_flight": self.in_flight,
+                "paused_for": max(0.0, self._paused_until - now),
+                "throttle_events": self._throttle_events,
+                "last_throttled": self._last_throttled,
+            }
@@ -0,0 +1,84 @@
+"""Columnar on-disk snapshots of survey data, shared by all workers of a host.
+
+Snapshots are Arrow IPC files, which every worker memory-maps read-only. That
+way the data is held once in the page cache, instead of once per worker process.
+A snapshot file is never modified. A new generation is written to a new file,
+and the `CURRENT` file pointing to it is replaced atomically.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+from django.conf import settings
+
+
+def get_snapshot_path(generation):
+    return Path(settings.SURVEY_SNAPSHOT_DIR) / f"survey-{generation}.arrow"
+
+
+def write_atomically(path, write):
+    """Write to a temporary file first, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_snapshot(survey_data_df, generation):
+    snapshot_dir = Path(settings.SURVEY_SNAPSHOT_DIR)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(survey_data_df, preserve_index=False)
+
+    def write_table(path):
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    write_atomically(get_snapshot_path(generation), write_table)
+    write_atomically(
+        snapshot_dir / "CURRENT", lambda path: Path(path).write_text(str(generation))
+    )
+
+    # workers that still have an older snapshot mapped keep their copy of the
+    # file until they switch, even if it's deleted here
+    for path in snapshot_dir.glob("survey-*.arrow"):
+        if path != get_snapshot_path(generation):
+            path.unlink(missing_ok=True)
+
+
+def get_current_generation():
+    try:
+        return int((Path(settings.SURVEY_SNAPSHOT_DIR) / "CURRENT").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+# the snapshot this process has mapped, swapped when the generation changes
+_snapshot = {"generation": None, "table": None}
+
+
+def load_snapshot():
+    """Return (generation, pyarrow.Table) of the current snapshot.
+
+    The table is memory-mapped, its data is only read from disk (or the page
+    cache) when it's accessed. Returns (None, None) if there is no snapshot yet.
+    """
+    generation = get_current_generation()
+    if generation is None:
+        return None, None
+
+    if generation != _snapshot["generation"]:
+        try:
+            source = pa.memory_map(str(get_snapshot_path(generation)), "r")
+        except FileNotFoundError:
+            # a newer snapshot replaced it in the meantime, or it was removed
+            return None, None
+        _snapshot["table"] = pa.ipc.open_file(source).read_all()
+        _snapshot["generation"] = generation
+
+    return _snapshot["generation"], _snapshot["table"]
@@ -0,0 +1,132 @@
+"""Caching of auth tokens for 3rd-party services, shared by all processes."""
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class TokenManager:
+    """Keep an auth token in the cache, and refresh it before it expires.
+
+    Only one refresh runs at a time: threads of a process wait on a lock, and
+    processes use `cache.add` as a lock, so not every worker logs in at the same
+    time when the token expires. Once the token is older than `ttl - refresh_before`
+    seconds, it is refreshed in a background thread, while the current token is
+    still returned. Only if there is no valid token, callers have to wait for it.
+
+    `cache.add` is atomic for the database cache (the default), memcached and redis.
+    With the file or local memory cache, processes may refresh at the same time.
+    """
+
+    def __init__(self, name, retrieve_token, ttl, refresh_before=60, lock_timeout=30):
+        self.name = name
+        self.retrieve_token = retrieve_token
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.lock_timeout = lock_timeout
+        self.cache_key = f"{name}-token"
+        self.lock_key = f"{name}-token-lock"
+        # _lock guards the stats, _refresh_lock makes threads wait for one refresh
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._stats = {
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "failed_refreshes": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def get(self):
+        """Return a valid token, refreshing it if needed."""
+        entry = cache.get(self.cache_key)
+        now = time.time()
+        if entry is not None and now < entry["expires_at"]:
+            if now >= entry["expires_at"] - self.refresh_before:
+                self._refresh_in_background()
+            return entry["token"]
+
+        start = time.monotonic()
+        try:
+            return self._refresh()
+        finally:
+            with self._lock:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - start
+
+    def invalidate(self):
+        cache.delete(self.cache_key)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _get_valid_token(self):
+        entry = cache.get(self.cache_key)
+        if entry is not None and time.time() < entry["expires_at"]:
+            return entry["token"]
+        return None
+
+    def _retrieve_and_store(self):
+        try:
+            token = self.retrieve_token()
+        except Exception:
+            with self._lock:
+                self._stats["failed_refreshes"] += 1
+            raise
+        cache.set(
+            self.cache_key,
+            {"token": token, "expires_at": time.time() + self.ttl},
+            self.ttl,
+        )
+        with self._lock:
+            self._stats["refreshes"] += 1
+        return token
+
+    def _refresh(self):
+        # threads of this process wait here, and then use the token the first one got
+        with self._refresh_lock:
+            token = self._get_valid_token()
+            if token is not None:
+                return token
+
+            # other processes are waited for until lock_timeout, after that we assume
+            # the lock is stale and get the token ourselves
+            deadline = time.monotonic() + self.lock_timeout
+            while not cache.add(self.lock_key, True, self.lock_timeout):
+                time.sleep(0.1)
+                token = self._get_valid_token()
+                if token is not None:
+                    return token
+                if time.monotonic() > deadline:
+                    return self._retrieve_and_store()
+            try:
+                return self._retrieve_and_store()
+            finally:
+                cache.delete(self.lock_key)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            # if another process is already refreshing, we keep using the current token
+            if not cache.add(self.lock_key, True, self.lock_timeout):
+                return
+            try:
+                self._retrieve_and_store()
+                with self._lock:
+                    self._stats["background_refreshes"] += 1
+            except Exception:
+                # the current token is still valid, next request will try again
+                pass
+            finally:
+                cache.delete(self.lock_key)
+        finally:
+            with self._lock:
+                self._refreshing = False
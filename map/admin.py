@@ -1,8 +1,14 @@
 from django.contrib import admin
 
-from .models import Map
+from .models import Map, MapJob
 
 
 @admin.register(Map)
 class MapAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(MapJob)
+class MapJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "status", "created_at", "finished_at"]
+    readonly_fields = ["map"]
@@ -0,0 +1,187 @@
+"""Map creation, run by a worker process outside of the request/response cycle.
+
+Jobs are stored in the database, so we don't need a separate message broker.
+The worker is started with `python manage.py run_map_jobs`.
+"""
+import datetime
+import logging
+import uuid
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from geochimp.utils.arcgis import (
+    create_arcgis_webmap,
+    create_submissions,
+    get_submissions_for_camera_folders,
+    interpolate_map_template,
+    project_submissions,
+)
+from geochimp.utils.mediavalet import download_mediavalet_folder_into_submission
+from photo_tagger.models import Submission
+
+from .models import JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, Map, MapJob
+
+logger = logging.getLogger(__name__)
+
+
+def set_job_progress(job, camera_folder, progress):
+    job.progress[camera_folder] = progress
+    job.save(update_fields=["progress"])
+
+
+def get_submissions(camera_folders):
+    """Return Submission objects for camera_folders, create missing ones."""
+    # @TODO: if we can re-use submission objects safely depends on
+    # whether submissions may change or not
+    # retrieve existing submission objects to access attributes
+    submissions = {
+        camera_folder: Submission.objects.filter(camera_folder=camera_folder).last()
+        for camera_folder in camera_folders
+    }
+    missing_camera_folders = [
+        camera_folder
+        for camera_folder, submission in submissions.items()
+        if submission is None
+    ]
+
+    if missing_camera_folders:
+        # there are submissions in Survey123, that do not yet have corresponding
+        # Submission objects. We resolve all of them at once.
+        survey_submissions = get_submissions_for_camera_folders(missing_camera_folders)
+        submissions.update(
+            create_submissions(
+                {
+                    camera_folder: survey_submission
+                    for camera_folder, survey_submission in survey_submissions.items()
+                    if survey_submission is not None
+                }
+            )
+        )
+
+    submissions = [x for x in submissions.values() if x is not None]
+
+    # submissions created before coordinates were stored on them
+    unprojected_submissions = [x for x in submissions if x.x_web_mercator is None]
+    if unprojected_submissions:
+        project_submissions(unprojected_submissions)
+        Submission.objects.bulk_update(
+            unprojected_submissions, ["x_web_mercator", "y_web_mercator"]
+        )
+
+    return submissions
+
+
+def build_map(job):
+    """Create map with photos for the camera folders of a MapJob."""
+    submissions = get_submissions(job.camera_folders)
+
+    submission_attributes = {}
+    for submission in submissions:
+        # @TODO: attach multiple photos
+        # For now we will just use the first, because it's not clear if it's
+        # possible to attach multiple images to a webmap popup.
+        # We can certainly find a way like composing an image ourselves,
+        # but for now we will embed one image
+
+        # @TODO: should we always download from MediaValet, regardless
+        # of photo object exists?
+        # Should we maybe never store photos at all?
+        photo = submission.photos.first()
+        if photo:
+            image_url = urljoin(job.base_url, photo.photo.url)
+        else:
+            set_job_progress(job, submission.camera_folder, "downloading photos")
+            # no photo object found, need to download from MediaValet
+            download_mediavalet_folder_into_submission(submission)
+            photo = submission.photos.first()
+            # no photo if there are no photos yet in MediaValet
+            image_url = urljoin(job.base_url, photo.photo.url) if photo else ""
+
+        values = {}
+        submission_attributes[submission.camera_folder] = values
+        values["x"] = submission.x_web_mercator
+        values["y"] = submission.y_web_mercator
+        values["title"] = submission.camera_folder
+        values["image_url"] = image_url
+        values["description"] = submission.submission_cleaned["project_name"][1]
+        set_job_progress(job, submission.camera_folder, "done")
+
+    map = Map.objects.create(submission_attributes=submission_attributes)
+    map_json = interpolate_map_template(submission_attributes)
+    map.webmap_json = map_json
+    map.save()
+
+    snippets = "\n".join(submission_attributes.keys())
+    webmap = create_arcgis_webmap(
+        map_json,
+        title=f"Map for {', '.join(submission_attributes.keys())}",
+        tags=list(submission_attributes.keys()),
+        snippet=f"This map shows photos for the following camera traps: {snippets}",
+    )
+
+    map.webmap_url = webmap.homepage
+    # store unique powerform_submission_id, to check powerform status
+    map.powerform_submission_id = uuid.uuid4()
+    map.save()
+
+    return map
+
+
+def fail_stale_jobs():
+    """Mark jobs running for longer than MAP_JOB_TIMEOUT as failed.
+
+    Their worker most likely died (e.g. out of memory or a container restart), so
+    they would stay "running" forever. They aren't queued again, as the same job
+    might kill the next worker, too. Returns the number of failed jobs.
+    """
+    timeout = datetime.timedelta(seconds=settings.MAP_JOB_TIMEOUT)
+    return MapJob.objects.filter(
+        status=JOB_RUNNING, started_at__lt=timezone.now() - timeout
+    ).update(
+        status=JOB_FAILED,
+        error="The map job was aborted, because it didn't finish in time.",
+        finished_at=timezone.now(),
+    )
+
+
+def claim_next_job():
+    """Mark the oldest queued job as running and return it, or None.
+
+    The conditional update makes sure that only one worker gets the job, even
+    with several workers polling at the same time.
+    """
+    fail_stale_jobs()
+    for job in MapJob.objects.filter(status=JOB_QUEUED).order_by("pk"):
+        claimed = MapJob.objects.filter(pk=job.pk, status=JOB_QUEUED).update(
+            status=JOB_RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_next_job():
+    """Run the next queued job. Returns False if there was nothing to do."""
+    close_old_connections()
+    job = claim_next_job()
+    if job is None:
+        return False
+
+    job.progress = {camera_folder: "queued" for camera_folder in job.camera_folders}
+    job.save(update_fields=["progress"])
+    try:
+        job.map = build_map(job)
+        job.status = JOB_DONE
+    except Exception as e:
+        # the error is shown on the job status page, which doesn't require a login.
+        # Messages may contain URLs with credentials (e.g. signed download links),
+        # so only the type of the error is stored and the traceback is logged.
+        logger.exception("Map job %s failed", job.pk)
+        job.status = JOB_FAILED
+        job.error = f"An unexpected error occurred ({type(e).__name__})."
+    job.finished_at = timezone.now()
+    job.save()
+    return True
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from map.jobs import fail_stale_jobs, run_next_job
+
+
+class Command(BaseCommand):
+    help = "Process queued map jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2,
+            help="Seconds to wait before checking for new jobs again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process all queued jobs and exit, instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        failed = fail_stale_jobs()
+        if failed:
+            self.stdout.write(f"Marked {failed} stale map jobs as failed.")
+        while True:
+            if run_next_job():
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
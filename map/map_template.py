@@ -6,26 +6,27 @@ create a thumbnail with preview of all photos and link to a page where they are
 displayed, or present them in some other way. But maybe there is a way to add multiple
 photos to a pop-up.
 """
+import json
 
 
-# f-strings are nice, but not with too many curly brackets
-# @TODO: make sure %f formatter doesn't truncate value
-single_feature_template = """
-{
-  "geometry": {
-    "x": %(x)f,
-    "y": %(y)f,
-    "spatialReference": { "wkid": 102100, "latestWkid": 3857 }
-  },
-  "attributes": {
-    "VISIBLE": 1,
-    "TYPEID": 0,
-    "TITLE": "%(title)s",
-    "IMAGE_URL": "%(image_url)s",
-    "DESCRIPTION": "<span style='background-color: rgb(255, 255, 255);'>%(description)s<br /></span>"
-  }
-}
-"""  # noqa: E501
+def single_feature(x, y, title, image_url, description):
+    """Return the feature for a single camera trap, as native Python objects."""
+    return {
+        "geometry": {
+            "x": x,
+            "y": y,
+            "spatialReference": {"wkid": 102100, "latestWkid": 3857},
+        },
+        "attributes": {
+            "VISIBLE": 1,
+            "TYPEID": 0,
+            "TITLE": title,
+            "IMAGE_URL": image_url,
+            "DESCRIPTION": "<span style='background-color: rgb(255, 255, 255);'>"
+            f"{description}<br /></span>",
+        },
+    }
+
 
 # @TODO: reduce this to the minimum necessary
 map_template = """
@@ -278,3 +279,6 @@ map_template = """
   "version": "2.25"
 }
 """  # noqa: E501
+
+# parsed only once, maps are built by copying this and adding features
+base_map = json.loads(map_template)
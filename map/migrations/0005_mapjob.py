@@ -0,0 +1,57 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("map", "0004_map_granted_at_map_granted_by_map_requested_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MapJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("camera_folders", models.JSONField(default=list)),
+                ("base_url", models.CharField(default="", max_length=1024)),
+                (
+                    "status",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "queued"),
+                            (1, "running"),
+                            (2, "done"),
+                            (3, "failed"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("progress", models.JSONField(default=dict)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "map",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to="map.map",
+                    ),
+                ),
+            ],
+        ),
+    ]
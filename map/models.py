@@ -23,3 +23,43 @@ class Map(models.Model):
 
     def __str__(self):
         return f"Map for {', '.join(self.submission_attributes.keys())}"
+
+
+# status of a MapJob
+JOB_QUEUED = 0
+JOB_RUNNING = 1
+JOB_DONE = 2
+JOB_FAILED = 3
+JOB_STATUS_CHOICES = [
+    (JOB_QUEUED, "queued"),
+    (JOB_RUNNING, "running"),
+    (JOB_DONE, "done"),
+    (JOB_FAILED, "failed"),
+]
+
+
+class MapJob(models.Model):
+    """Map creation running in the background, see `manage.py run_map_jobs`.
+
+    Creating a map can take much longer than a request is allowed to take, e.g.
+    when photos have to be downloaded from MediaValet for many camera folders.
+    """
+
+    camera_folders = models.JSONField(default=list)
+    # the worker has no request, so we keep the URL to build absolute photo URLs
+    base_url = models.CharField(max_length=1024, default="")
+    status = models.PositiveSmallIntegerField(
+        choices=JOB_STATUS_CHOICES, default=JOB_QUEUED
+    )
+    # status for each camera_folder, e.g. {"CAMERA1_20220801": "downloading photos"}
+    progress = models.JSONField(default=dict)
+    error = models.TextField(default="", blank=True)
+    map = models.ForeignKey(
+        "Map", related_name="jobs", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Map job {self.pk}: {self.get_status_display()}"
@@ -1,7 +1,7 @@
 """map app URL Configuration."""
 from django.urls import path
 
-from .views import create_map
+from .views import create_map, map_job_status
 
 urlpatterns = [
     path(
@@ -9,4 +9,5 @@ urlpatterns = [
         create_map,
         name="create_map",
     ),
+    path("jobs/<int:job_id>/", map_job_status, name="map_job_status"),
 ]
@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from .models import Photo, Submission, TagRequest
+from .models import (
+    Photo,
+    Submission,
+    SurveySubmission,
+    SurveySync,
+    TagRequest,
+    UploadedAsset,
+    UploadJournal,
+)
 
 
 @admin.register(Submission)
@@ -17,3 +25,26 @@ class PhotoAdmin(admin.ModelAdmin):
 @admin.register(TagRequest)
 class TagRequestAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(SurveySubmission)
+class SurveySubmissionAdmin(admin.ModelAdmin):
+    list_display = ["id", "camera_id", "camera_setup_date", "edit_date"]
+    list_display_links = ["id", "camera_id"]
+    search_fields = ["camera_id"]
+
+
+@admin.register(SurveySync)
+class SurveySyncAdmin(admin.ModelAdmin):
+    list_display = ["id", "generation", "watermark", "synced_at"]
+
+
+@admin.register(UploadedAsset)
+class UploadedAssetAdmin(admin.ModelAdmin):
+    list_display = ["id", "asset_id", "folder_id", "sha256", "created_at"]
+    search_fields = ["asset_id", "folder_id", "sha256"]
+
+
+@admin.register(UploadJournal)
+class UploadJournalAdmin(admin.ModelAdmin):
+    list_display = ["id", "asset_id", "folder_id", "step", "updated_at"]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from geochimp.utils.mediavalet import (
+    backfill_uploaded_assets,
+    get_mediavalet_folder_index,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Hash assets already in MediaValet, so uploading the same photos again "
+        "is skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "camera_folders",
+            nargs="*",
+            help="Camera folders to backfill, all folders if none are given.",
+        )
+
+    def handle(self, *args, **options):
+        camera_folders = options["camera_folders"] or sorted(
+            get_mediavalet_folder_index()
+        )
+        for camera_folder in camera_folders:
+            added = backfill_uploaded_assets(camera_folder)
+            self.stdout.write(f"{camera_folder}: {added} assets hashed")
+        self.stdout.write(self.style.SUCCESS("Backfilled asset hashes."))
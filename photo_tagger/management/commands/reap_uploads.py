@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from geochimp.utils.mediavalet import reap_abandoned_uploads
+
+
+class Command(BaseCommand):
+    help = "Discard MediaValet uploads that were abandoned before they were approved."
+
+    def handle(self, *args, **options):
+        reaped = reap_abandoned_uploads()
+        self.stdout.write(self.style.SUCCESS(f"Discarded {reaped} uploads."))
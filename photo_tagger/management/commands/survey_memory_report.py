@@ -0,0 +1,89 @@
+import random
+import tracemalloc
+import uuid
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from geochimp.utils.arcgis import project_survey_df
+
+
+def create_synthetic_survey_df(rows):
+    """Create a DataFrame that looks like `survey.download("DF")`."""
+    random.seed(0)
+    creation_dates = pd.date_range("2020-01-01", periods=rows, freq="17min")
+    return pd.DataFrame(
+        {
+            "objectid": range(rows),
+            "globalid": [str(uuid.uuid4()) for _ in range(rows)],
+            "CreationDate": creation_dates,
+            "Creator": [f"user{random.randrange(20)}" for _ in range(rows)],
+            "EditDate": creation_dates,
+            "Editor": [f"user{random.randrange(20)}" for _ in range(rows)],
+            "project_name": [f"Project {random.randrange(5)}" for _ in range(rows)],
+            "your_name": [
+                f"Forest Monitor {random.randrange(20)}" for _ in range(rows)
+            ],
+            "camera_id": [f"CAMERA{random.randrange(200)}" for _ in range(rows)],
+            "date_and_time_of_camera_setup_o": creation_dates.floor("D"),
+            "camera_attached_to_": [
+                random.choice(["tree", "pole", "rock", "other"]) for _ in range(rows)
+            ],
+            "camera_attached_to__other": [None] * rows,
+            "camera_height_cm": [float(random.randrange(20, 200)) for _ in range(rows)],
+            "name_of_the_area_deployed": [
+                f"Chimpanzee retreat zone {random.randrange(30)}" for _ in range(rows)
+            ],
+            "camera_make": [
+                random.choice(["Bushnell", "Browning"]) for _ in range(rows)
+            ],
+            "camera_make_other": [None] * rows,
+            "what_feature_is_the_camera_targ": [
+                random.choice(["trail", "fruiting tree", "water"]) for _ in range(rows)
+            ],
+            "what_feature_is_the_camera_targ_other": [None] * rows,
+            "comments": [
+                "Camera was set up facing north, batteries replaced. " * 2
+                for _ in range(rows)
+            ],
+            "photos": [
+                [{"name": f"IMG_{i:04}.JPG", "size": 123456}] for i in range(rows)
+            ],
+            "SHAPE": [
+                {
+                    "x": random.uniform(-10, 30),
+                    "y": random.uniform(-10, 10),
+                    "spatialReference": {"wkid": 4326, "latestWkid": 4326},
+                }
+                for _ in range(rows)
+            ],
+        }
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare memory of the full survey DataFrame with the projected one, "
+        "using a synthetic survey."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        tracemalloc.start()
+        survey_data_df = create_synthetic_survey_df(options["rows"])
+        _, peak_full = tracemalloc.get_traced_memory()
+        full_bytes = survey_data_df.memory_usage(deep=True).sum()
+
+        tracemalloc.reset_peak()
+        lean_df = project_survey_df(survey_data_df)
+        del survey_data_df
+        _, peak_projection = tracemalloc.get_traced_memory()
+        lean_bytes = lean_df.memory_usage(deep=True).sum()
+        tracemalloc.stop()
+
+        self.stdout.write(f"rows:                      {len(lean_df)}")
+        self.stdout.write(f"full DataFrame:            {full_bytes:>14,} bytes")
+        self.stdout.write(f"projected DataFrame:       {lean_bytes:>14,} bytes")
+        self.stdout.write(f"peak creating full:        {peak_full:>14,} bytes")
+        self.stdout.write(f"peak during projection:    {peak_projection:>14,} bytes")
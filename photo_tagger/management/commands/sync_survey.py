@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from geochimp.utils.arcgis import sync_survey_submissions
+
+
+class Command(BaseCommand):
+    help = "Sync Survey123 submissions into the local mirror."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Download the whole survey instead of only new and edited "
+            "submissions, and remove submissions that no longer exist.",
+        )
+
+    def handle(self, *args, **options):
+        synced = sync_survey_submissions(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Synced {synced} changed submissions."))
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from geochimp.utils.arcgis import (
+    sync_survey_submissions_if_stale,
+    write_survey_snapshot,
+)
+from geochimp.utils.snapshot import get_current_generation
+from photo_tagger.models import SurveySync
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync Survey123 submissions if the mirror is stale, and write a new survey "
+        "snapshot for the workers if the mirror changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Repeat every INTERVAL seconds, instead of running only once.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # the connection may have been closed by the database in the meantime
+            close_old_connections()
+            try:
+                self.write_snapshot()
+            except Exception:
+                if not options["interval"]:
+                    raise
+                # e.g. Survey123 or the database aren't reachable, try again later
+                logger.exception("Updating the survey snapshot failed")
+
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def write_snapshot(self):
+        sync_survey_submissions_if_stale()
+        generation = SurveySync.objects.values_list("generation", flat=True).first()
+        if get_current_generation() != (generation or 0):
+            generation = write_survey_snapshot()
+            self.stdout.write(f"Wrote survey snapshot {generation}.")
@@ -0,0 +1,63 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:08
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photo_tagger", "0008_submission_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SurveySubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("global_id", models.CharField(max_length=64, unique=True)),
+                ("camera_id", models.CharField(default="", max_length=255)),
+                ("camera_setup_date", models.DateField(blank=True, null=True)),
+                ("creation_date", models.DateTimeField(blank=True, null=True)),
+                ("edit_date", models.DateTimeField(blank=True, null=True)),
+                (
+                    "submission_raw",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SurveySync",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("watermark", models.DateTimeField(blank=True, null=True)),
+                ("synced_at", models.DateTimeField(blank=True, null=True)),
+                ("generation", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="surveysubmission",
+            index=models.Index(
+                fields=["camera_id", "camera_setup_date"],
+                name="photo_tagge_camera__812ca2_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photo_tagger", "0009_surveysubmission_surveysync"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="x_web_mercator",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="y_web_mercator",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
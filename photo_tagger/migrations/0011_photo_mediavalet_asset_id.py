@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photo_tagger", "0010_submission_web_mercator"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="photo",
+            name="mediavalet_asset_id",
+            field=models.CharField(blank=True, default="", max_length=36),
+        ),
+    ]
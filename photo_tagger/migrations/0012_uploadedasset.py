@@ -0,0 +1,37 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photo_tagger", "0011_photo_mediavalet_asset_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadedAsset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64)),
+                ("asset_id", models.CharField(max_length=36)),
+                ("folder_id", models.CharField(max_length=36)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="uploadedasset",
+            constraint=models.UniqueConstraint(
+                fields=("folder_id", "sha256"), name="unique_asset_hash_per_folder"
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0.6 on 2026-10-18 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("photo_tagger", "0012_uploadedasset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadJournal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64)),
+                ("folder_id", models.CharField(max_length=36)),
+                ("asset_id", models.CharField(max_length=36)),
+                ("upload_url", models.TextField()),
+                (
+                    "step",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "created"),
+                            (1, "blob uploaded"),
+                            (2, "title set"),
+                            (3, "added to folder"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="uploadjournal",
+            constraint=models.UniqueConstraint(
+                fields=("folder_id", "sha256"), name="unique_upload_per_folder"
+            ),
+        ),
+    ]
@@ -1,6 +1,18 @@
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
+# steps of a MediaValet upload that were completed, see UploadJournal
+UPLOAD_CREATED = 0
+UPLOAD_BLOB_UPLOADED = 1
+UPLOAD_TITLE_SET = 2
+UPLOAD_ADDED_TO_FOLDER = 3
+UPLOAD_STEP_CHOICES = [
+    (UPLOAD_CREATED, "created"),
+    (UPLOAD_BLOB_UPLOADED, "blob uploaded"),
+    (UPLOAD_TITLE_SET, "title set"),
+    (UPLOAD_ADDED_TO_FOLDER, "added to folder"),
+]
+
 STATUS_CHOICES = [
     # @TODO: For now we only care about sent, declined and completed
     # we use integers here because we don't want to store strings in the DB.
@@ -17,6 +29,9 @@ class Submission(models.Model):
     submission_raw = models.JSONField(encoder=DjangoJSONEncoder)
     submission_cleaned = models.JSONField(encoder=DjangoJSONEncoder)
     created_at = models.DateTimeField(auto_now_add=True, blank=True, null=True)
+    # coordinates projected for ArcGIS maps, set when the submission is created
+    x_web_mercator = models.FloatField(blank=True, null=True)
+    y_web_mercator = models.FloatField(blank=True, null=True)
 
     def __str__(self):
         return self.camera_folder
@@ -32,6 +47,8 @@ class Photo(models.Model):
     # when `IMG_0209.JPG` already exists in the folder.
     # With a dynamic folder based e.g. on camera_folder that won't happen
     photo = models.ImageField(upload_to="photos")
+    # set for photos downloaded from MediaValet, so they aren't downloaded again
+    mediavalet_asset_id = models.CharField(max_length=36, blank=True, default="")
 
     def __str__(self):
         return f"{self.submission.camera_folder}: {self.photo.name.split('/')[-1]}"
@@ -63,3 +80,87 @@ class TagRequest(models.Model):
 
     def __str__(self):
         return f"{self.submission.camera_folder}: {self.powerform_submission_id}"
+
+
+class SurveySubmission(models.Model):
+    """Local mirror of a Survey123 submission.
+
+    Kept up to date by `geochimp.utils.arcgis.sync_survey_submissions`, so we
+    don't have to download the whole survey whenever we need submission data.
+    """
+
+    global_id = models.CharField(max_length=64, unique=True)
+    camera_id = models.CharField(max_length=255, default="")
+    camera_setup_date = models.DateField(blank=True, null=True)
+    creation_date = models.DateTimeField(blank=True, null=True)
+    edit_date = models.DateTimeField(blank=True, null=True)
+    # using DjangoJSONEncoder to serialize datetime objects correctly
+    submission_raw = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [models.Index(fields=["camera_id", "camera_setup_date"])]
+
+    def __str__(self):
+        return f"{self.camera_id}: {self.camera_setup_date}"
+
+
+class SurveySync(models.Model):
+    """State of the local Survey123 mirror. There is only ever one row."""
+
+    # latest CreationDate/EditDate we have seen, next sync starts from here
+    watermark = models.DateTimeField(blank=True, null=True)
+    synced_at = models.DateTimeField(blank=True, null=True)
+    # incremented whenever the mirror changes, can be used to invalidate caches
+    generation = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Survey sync {self.generation}: {self.synced_at}"
+
+
+class UploadedAsset(models.Model):
+    """Content hash of an asset in MediaValet, so we don't upload files twice."""
+
+    sha256 = models.CharField(max_length=64)
+    asset_id = models.CharField(max_length=36)
+    folder_id = models.CharField(max_length=36)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["folder_id", "sha256"], name="unique_asset_hash_per_folder"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id}: {self.sha256}"
+
+
+class UploadJournal(models.Model):
+    """Progress of an unfinished upload of a file to MediaValet.
+
+    Uploading takes several steps, if one fails the upload is resumed from the next
+    step. The journal is deleted once the upload is approved, abandoned uploads are
+    cleaned up by the `reap_uploads` command.
+    """
+
+    sha256 = models.CharField(max_length=64)
+    folder_id = models.CharField(max_length=36)
+    asset_id = models.CharField(max_length=36)
+    # Shared Access Signature (SAS) URL the file is uploaded to
+    upload_url = models.TextField()
+    step = models.PositiveSmallIntegerField(
+        choices=UPLOAD_STEP_CHOICES, default=UPLOAD_CREATED
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["folder_id", "sha256"], name="unique_upload_per_folder"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id}: {self.get_step_display()}"
@@ -0,0 +1,254 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from geochimp.utils import arcgis, mediavalet
+from geochimp.utils.arcgis import (
+    clean_submission,
+    clean_submissions_df,
+    parse_metadata_attributes,
+    project_survey_df,
+)
+
+METADATA_ATTRIBUTES = {
+    "project_name": "Project Name",
+    "camera_id": "Camera ID",
+    "camera_attached_to__other": "Camera attached to",
+    "camera_height_cm": "Height of camera",
+    "comments": "Comments",
+    "SHAPE": "x~y",
+}
+
+
+def create_survey_df():
+    """A few submissions like the ones in `survey.download("DF")`."""
+    return pd.DataFrame(
+        {
+            "globalid": ["a", "b", "c"],
+            "CreationDate": pd.to_datetime(
+                ["2022-08-01 10:00", "2022-08-02 11:00", "2022-08-03 12:00"]
+            ),
+            "project_name": ["Project 1", "Project 2", None],
+            "camera_id": ["CAMERA1", "CAMERA2", "CAMERA3"],
+            "date_and_time_of_camera_setup_o": pd.to_datetime(
+                ["2022-08-01", "2022-08-02", "2022-08-03"]
+            ),
+            "camera_attached_to_": ["tree", "other", "pole"],
+            "camera_attached_to__other": [None, "fence", ""],
+            "camera_height_cm": [50.0, 120.0, None],
+            "comments": ["Facing north", None, ""],
+            "SHAPE": [
+                {"x": -32.4415, "y": -3.84902, "spatialReference": {"wkid": 4326}},
+                {"x": 7.1397, "y": 50.6966, "spatialReference": {"wkid": 4326}},
+                {"x": 0.0, "y": 0.0, "spatialReference": {"wkid": 4326}},
+            ],
+        }
+    )
+
+
+def with_none(survey_data_df):
+    # NaN/NaT are replaced with None, like in `build_camera_folder_index`
+    return survey_data_df.astype(object).where(survey_data_df.notna(), None)
+
+
+@override_settings(METADATA_ATTRIBUTES=METADATA_ATTRIBUTES)
+class CleanSubmissionsDfTest(SimpleTestCase):
+    def setUp(self):
+        parse_metadata_attributes.cache_clear()
+        self.addCleanup(parse_metadata_attributes.cache_clear)
+
+    def assert_same_as_clean_submission(self, survey_data_df):
+        survey_data_df = with_none(survey_data_df)
+        records = survey_data_df.to_dict("records")
+        cleaned = clean_submissions_df(survey_data_df)
+        self.assertEqual(len(cleaned), len(records))
+        for submission_raw, submission_cleaned in zip(records, cleaned):
+            self.assertEqual(submission_cleaned, clean_submission(submission_raw))
+
+    def test_matches_clean_submission(self):
+        self.assert_same_as_clean_submission(create_survey_df())
+
+    def test_matches_clean_submission_for_projected_df(self):
+        self.assert_same_as_clean_submission(project_survey_df(create_survey_df()))
+
+    def test_other_option(self):
+        cleaned = clean_submissions_df(with_none(create_survey_df()))
+        self.assertEqual(
+            [x["camera_attached_to__other"][1] for x in cleaned],
+            ["tree", "fence", "pole"],
+        )
+
+
+class FakeFeatureLayer:
+    """Stand-in for the survey's feature layer, which records its queries."""
+
+    def __init__(self, survey_data_df=None, error=None):
+        self.survey_data_df = survey_data_df
+        self.error = error
+        self.queries = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(sdf=self.survey_data_df)
+
+
+@override_settings(
+    METADATA_ATTRIBUTES=METADATA_ATTRIBUTES, CAMERA_SETUP_DATE_FORMAT="%Y%m%d"
+)
+class QuerySubmissionsForCameraFolderTest(SimpleTestCase):
+    def setUp(self):
+        parse_metadata_attributes.cache_clear()
+        self.addCleanup(parse_metadata_attributes.cache_clear)
+        patcher = mock.patch.object(arcgis.gis_sessions, "get", return_value=object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def query(self, layer, camera_folder="CAMERA2_20220802"):
+        with mock.patch.object(
+            arcgis, "get_survey_layer", return_value=layer
+        ), mock.patch.object(
+            arcgis, "download_submissions_df", return_value=create_survey_df()
+        ) as download:
+            survey_data_df = arcgis.query_submissions_for_camera_folder(camera_folder)
+        return survey_data_df, download
+
+    def test_filter_is_pushed_down(self):
+        layer = FakeFeatureLayer(create_survey_df().iloc[[1]])
+        survey_data_df, download = self.query(layer)
+
+        download.assert_not_called()
+        self.assertEqual(list(survey_data_df["globalid"]), ["b"])
+        (query,) = layer.queries
+        self.assertEqual(
+            query["where"],
+            "camera_id = 'CAMERA2' "
+            "AND date_and_time_of_camera_setup_o >= DATE '2022-08-02' "
+            "AND date_and_time_of_camera_setup_o < DATE '2022-08-03'",
+        )
+        out_fields = query["out_fields"].split(",")
+        for field in ("globalid", "EditDate", "CreationDate", "camera_id"):
+            self.assertIn(field, out_fields)
+        # geometry isn't a field, it's returned separately
+        self.assertNotIn("SHAPE", out_fields)
+        self.assertTrue(query["return_geometry"])
+
+    def test_camera_id_is_escaped(self):
+        layer = FakeFeatureLayer(create_survey_df().iloc[[]])
+        self.query(layer, camera_folder="CAMERA'2_20220802")
+        self.assertIn("camera_id = 'CAMERA''2' ", layer.queries[0]["where"])
+
+    def test_falls_back_to_download_on_arcgis_error(self):
+        layer = FakeFeatureLayer(
+            error=Exception("Unable to perform query.\n(Error Code: 400)")
+        )
+        with self.assertLogs("geochimp.utils.arcgis", "WARNING"):
+            survey_data_df, download = self.query(layer)
+
+        download.assert_called_once_with()
+        self.assertEqual(list(survey_data_df["globalid"]), ["b"])
+
+    def test_other_errors_are_raised(self):
+        layer = FakeFeatureLayer(error=TypeError("unexpected keyword argument"))
+        with self.assertRaises(TypeError):
+            self.query(layer)
+
+
+class AsyncMediaValetClientTest(TransactionTestCase):
+    """The token is cached in the database, so this runs against the test database."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.tokens = iter(["expired", "valid"])
+        patcher = mock.patch.object(
+            mediavalet.mediavalet_tokens,
+            "retrieve_token",
+            side_effect=lambda: next(self.tokens),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, handler):
+        async def request():
+            async with mediavalet.AsyncMediaValetClient() as client:
+                client.client = httpx.AsyncClient(
+                    transport=httpx.MockTransport(handler)
+                )
+                return await client.request(method, "/assets/1")
+
+        return asyncio.run(request())
+
+    def test_rejected_token_is_replaced(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request.headers["Authorization"])
+            if request.headers["Authorization"] == "Bearer expired":
+                return httpx.Response(401)
+            return httpx.Response(200, json={"payload": {}})
+
+        # also for methods that aren't retried otherwise
+        for method in ("GET", "POST"):
+            with self.subTest(method=method):
+                cache.clear()
+                self.tokens = iter(["expired", "valid"])
+                requests.clear()
+                res = self.request(method, handler)
+                self.assertEqual(res.status_code, 200)
+                self.assertEqual(requests, ["Bearer expired", "Bearer valid"])
+
+    def test_token_is_replaced_once(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request.headers["Authorization"])
+            return httpx.Response(401)
+
+        res = self.request("GET", handler)
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(requests, ["Bearer expired", "Bearer valid"])
+
+
+class TooManyRequestsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        self.send_response(429)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(MEDIAVALET_MAX_RETRIES=3)
+class MediaValetClientTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), TooManyRequestsHandler)
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_responses_are_only_retried_by_the_client(self):
+        client = mediavalet.MediaValetClient()
+        # the client only mounts its adapter for https
+        client.session.mount("http://", client.session.get_adapter("https://"))
+        url = f"http://127.0.0.1:{self.server.server_port}/"
+
+        with mock.patch.object(mediavalet.time, "sleep") as sleep:
+            res = client.get(url, authenticated=False)
+
+        self.assertEqual(res.status_code, 429)
+        # urllib3 must not retry on its own, these attempts would bypass the limiter
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(sleep.call_count, 3)
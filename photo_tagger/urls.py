@@ -1,7 +1,13 @@
 """photo_tagger app URL Configuration."""
 from django.urls import path, re_path
 
-from .views import IndexView, get_survey_submission, tag_photos, upload_photos
+from .views import (
+    IndexView,
+    get_survey_submission,
+    service_stats,
+    tag_photos,
+    upload_photos,
+)
 
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
@@ -16,4 +22,5 @@ urlpatterns = [
         name="upload_photos",
     ),
     path("tag/<int:submission_id>/", tag_photos, name="tag_photos"),
+    path("stats/", service_stats, name="service_stats"),
 ]
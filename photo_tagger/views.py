@@ -3,6 +3,8 @@ import uuid
 from urllib.parse import urlencode
 
 from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import HttpResponseRedirect, HttpResponse
 from django.shortcuts import render
 from django.urls import reverse
@@ -12,12 +14,23 @@ from photo_tagger.models import Submission
 
 from .forms import CameraFolderForm, UploadForm
 from .models import Photo
-from geochimp.utils.arcgis import clean_submission, get_submissions_for_camera_folder
+from geochimp.utils.arcgis import (
+    create_submissions,
+    get_submission_for_camera_folder,
+    gis_sessions,
+)
 from geochimp.utils.common import write_gps_coordinates_to_exif
+from geochimp.utils.docusign import docusign_tokens
 from geochimp.utils.mediavalet import (
-    get_mediavalet_assets,
+    TAGGING_ASSET_FIELDS,
+    get_mediavalet_client,
     get_mediavalet_folder_id,
+    get_mediavalet_assets,
+    get_tagging_message,
+    iter_mediavalet_assets,
     tag_mediavalet_attributes,
+    mediavalet_limiter,
+    mediavalet_tokens,
     upload_submission_photos_to_mediavalet,
 )
 
@@ -39,23 +52,15 @@ def get_survey_submission(request, action):
             # we have the name of the folder, that is used in MediaValet
             # we need to identify the matching submission[s], so we can
             # use submission data for tagging the photos
-            submissions = get_submissions_for_camera_folder(camera_folder)
-            # logging.debug(
-            #     'Retrieved %s submissions for "%s"', len(submissions), camera_folder
-            # )
+            # @TODO: let user choose when >1 submissions - for now we use latest
+            survey_submission = get_submission_for_camera_folder(camera_folder)
 
-            if len(submissions) == 0:
+            if survey_submission is None:
                 form.add_error(
                     field="camera_folder",
                     error="No submission for the combination of CAMERAID + DATE found!",
                 )
             else:
-                # @TODO: let user choose when >1 submissions - for now we use latest
-                submission_raw = submissions.sort_values("CreationDate").to_dict(
-                    "records"
-                )[-1]
-                submission_cleaned = clean_submission(submission_raw)
-
                 # @TOOD: decide whether to always create a new submission object for the
                 # same camera_folder, or re-use existing objects.
                 # Guess this depends on whether Survey123 data could ever be edited.
@@ -64,11 +69,9 @@ def get_survey_submission(request, action):
                 # If not, or we can easily check if a submission was edited, we could
                 # reuse the same object to save time and make some things easier, for
                 # example we could use ModelChoiceField etc.
-                submission = Submission.objects.create(
-                    camera_folder=camera_folder,
-                    submission_raw=submission_raw,
-                    submission_cleaned=submission_cleaned,
-                )
+                submission = create_submissions({camera_folder: survey_submission})[
+                    camera_folder
+                ]
                 if action == "upload":
                     return HttpResponseRedirect(
                         reverse(
@@ -112,14 +115,38 @@ def upload_photos(request, submission_id):
                     write_gps_coordinates_to_exif(lat_lon, photo.photo.path)
 
             # @TODO: only upload photos to MediaValet after DocuSign sign-off
-            upload_submission_photos_to_mediavalet(submission)
+            results = upload_submission_photos_to_mediavalet(submission)
 
             # delete photos uploaded by user. From here on, if we work with photos
-            # we'll retrieve them from MediaValet, in case they got updated there
-            submission.photos.all().delete()
+            # we'll retrieve them from MediaValet, in case they got updated there.
+            # Photos that failed to upload are kept, they are retried with the
+            # next upload. Skipped photos are already in MediaValet
+            done = [x for x in results if x["error"] is None]
+            submission.photos.filter(id__in=[x["photo"].id for x in done]).delete()
+            skipped_count = sum(x["skipped"] for x in done)
+            uploaded_count = len(done) - skipped_count
+
+            failed_uploads = [x for x in results if x["error"] is not None]
+            if not failed_uploads:
+                messages.info(
+                    request,
+                    f"{uploaded_count} photo(s) uploaded, {skipped_count} skipped "
+                    f"because they were already in MediaValet.",
+                )
+                return HttpResponseRedirect(
+                    reverse("tag_photos", kwargs={"submission_id": submission.id})
+                )
 
-            return HttpResponseRedirect(
-                reverse("tag_photos", kwargs={"submission_id": submission.id})
+            return render(
+                request,
+                template_name="photo_tagger/upload.html",
+                context={
+                    "submission": submission,
+                    "form": UploadForm(),
+                    "uploaded_count": uploaded_count,
+                    "skipped_count": skipped_count,
+                    "failed_uploads": failed_uploads,
+                },
             )
 
     else:
@@ -133,18 +160,18 @@ def upload_photos(request, submission_id):
     )
 
 
+def get_asset_titles(mediavalet_folder):
+    return [x["title"] for x in iter_mediavalet_assets(mediavalet_folder, ["title"])]
+
+
 def tag_photos(request, submission_id):
     submission = Submission.objects.get(pk=submission_id)
     mediavalet_folder = get_mediavalet_folder_id(submission.camera_folder)
     # we have the ID of the folder named like camera
-    try:
-        asset_list = get_mediavalet_assets(mediavalet_folder)
-    except KeyError:
+    if mediavalet_folder is None:
         return HttpResponse(
             "Folder doesn't exist in MediaValet. Please make sure it's created first."
         )
-    asset_titles = tuple(x["title"] for x in asset_list)
-    asset_ids = tuple(x["id"] for x in asset_list)
 
     cleaned_data = submission.submission_cleaned
     attributes_direct = settings.METADATA_ATTRIBUTES_DIRECT
@@ -171,16 +198,17 @@ def tag_photos(request, submission_id):
         if settings.REQUIRE_DOCUSIGN_FOR_ASSET_TAGGING is False:
             # @TODO: add optional replacing of assets with updated exif GPS tags
             # However, this means downloading the assets, deleting them and re-uploading
-            tag_mediavalet_attributes(attributes_to_tag, asset_ids)
+            assets = iter_mediavalet_assets(mediavalet_folder, TAGGING_ASSET_FIELDS)
+            results = tag_mediavalet_attributes(attributes_to_tag, assets)
             return render(
                 request,
                 template_name="photo_tagger/success.html",
                 context={
-                    "message": f"Successfully tagged assets for "
-                    f"{submission.camera_folder}",
+                    "message": get_tagging_message(submission.camera_folder, results),
                 },
             )
         else:
+            asset_titles = get_asset_titles(mediavalet_folder)
             # store unique powerform_submission_id, in case there are multiple tagging
             # iterations
             powerform_submission_id = uuid.uuid4()
@@ -198,6 +226,9 @@ def tag_photos(request, submission_id):
             )
             return HttpResponseRedirect(complete_url)
 
+    # dry run, to show which assets will actually change
+    assets = get_mediavalet_assets(mediavalet_folder, TAGGING_ASSET_FIELDS)
+    planned = tag_mediavalet_attributes(attributes_to_tag, assets, dry_run=True)
     return render(
         request,
         # @TODO: add description to template what will happen when request is sent
@@ -206,7 +237,42 @@ def tag_photos(request, submission_id):
             "submission": submission,
             "mediavalet_folder": mediavalet_folder,
             "attributes_to_tag": attributes_to_tag,
-            "asset_titles": asset_titles,
+            "asset_titles": [x["title"] for x in assets],
+            "changed_asset_titles": [
+                asset["title"]
+                for asset, plan in zip(assets, planned)
+                if plan["changes"] > 0
+            ],
+            "planned_writes": sum(x["changes"] for x in planned),
             "require_docusign": settings.REQUIRE_DOCUSIGN_FOR_ASSET_TAGGING is True,
         },
     )
+
+
+@staff_member_required
+def service_stats(request):
+    """Show how this worker process uses 3rd-party services.
+
+    The stats are kept in memory by each process, so they are only those of the
+    process handling the request.
+    """
+    endpoints = get_mediavalet_client().stats()
+    return render(
+        request,
+        template_name="photo_tagger/stats.html",
+        context={
+            "services": {
+                "ArcGIS session": gis_sessions.stats(),
+                "MediaValet token": mediavalet_tokens.stats(),
+                "MediaValet rate limiter": mediavalet_limiter.stats(),
+                "DocuSign token": docusign_tokens.stats(),
+            },
+            "endpoints": {
+                endpoint: {
+                    "count": x["count"],
+                    "avg_seconds": x["seconds"] / x["count"] if x["count"] else 0.0,
+                }
+                for endpoint, x in sorted(endpoints.items())
+            },
+        },
+    )